@@ -1,5 +1,6 @@
 from .exceptions import ParserError
 from .types import *
+from fileHandler.binary import Handler as BinaryHandler
 from fileHandler.xml import Handler as XmlHandler
 
 
@@ -9,16 +10,20 @@ class TreeHandler:
     """
 
     @staticmethod
-    def buildFromXML(file):
+    def buildFromXML(file, checksum=None):
         """
         Generates a Class which represents the tree in the given xml file
 
         :param file: File to load the tree from
+        :param checksum: checksum of a trusted file (see TreeHandler.checksum), skips the xsd validation if it matches
         :return: data.Tree or None if format is not correct
         :raises ParserError: if loading fails
         """
         xmlHandler = XmlHandler()
-        if xmlHandler.loadFile(file) is False:
+        if xmlHandler.sniffFile(file) is True:
+            trusted = checksum is not None and XmlHandler.checksum(file) == checksum
+            return TreeHandler.streamFromXML(file, xmlHandler, trusted)
+        if xmlHandler.loadFile(file, checksum) is False:
             raise ParserError(('Can\'t load %s, check dir. Abort' % file))
         tree = Tree(xmlHandler.extended)
         meta = xmlHandler.xml.find('meta')
@@ -50,6 +55,42 @@ class TreeHandler:
             return None
         return tree
 
+    @staticmethod
+    def streamFromXML(file, xmlHandler, trusted=False):
+        """
+        Generates the tree from a file in the extended format without loading the whole file.
+        The nodes and edges are added while the file is read
+
+        :param file: File to load the tree from
+        :param xmlHandler: Handler for the file
+        :param trusted: skips the xsd validation and adds the nodes and edges with bulkLoad
+        :return: data.Tree
+        :raises ParserError: if loading fails
+        """
+        tree = Tree(True)
+        nodes = []
+        edges = []
+        for section, element in xmlHandler.iterExtended(file, not trusted):
+            if section == 'meta':
+                for m in element.iterchildren():
+                    tree.meta[m.tag] = m.text
+            elif trusted is True and section == 'connections':
+                edges.append((element.get('source'), element.get('destination')))
+            elif trusted is True:
+                nodes.append(Parsers.parseNode(element))
+            elif section == 'connections':
+                Parsers.parseExtendedConnection(tree, element)
+            else:
+                Parsers.parseExtendedNode(tree, element)
+        if trusted is True:
+            TreeHandler.bulkLoad(tree, nodes, edges)
+        tree.root = tree.meta.get('root')
+        if tree.root in tree.nodeList.keys():
+            tree.nodeList[tree.root].isRoot = True
+        else:
+            raise ParserError('Root Element with ID %s not found in node list' % tree.root)
+        return tree
+
     @staticmethod
     def saveToXML(tree, file):
         """
@@ -60,8 +101,81 @@ class TreeHandler:
         :return: True if saving was successfully else returns exception
         """
         xmlHandler = XmlHandler()
-        xmlHandler.generateTree(tree)
-        return xmlHandler.saveToFile(file)
+        return xmlHandler.saveTree(tree, file)
+
+    @staticmethod
+    def buildFromBinary(file):
+        """
+        Generates a Class which represents the tree in the given binary snapshot
+
+        :param file: File to load the tree from
+        :return: data.Tree
+        :raises ParserError: if loading fails
+        """
+        extended, meta, nodes, edges, root = BinaryHandler().loadFile(file)
+        tree = Tree(extended)
+        tree.meta.update(meta)
+        TreeHandler.bulkLoad(tree, nodes, edges)
+        tree.root = root
+        tree.meta['root'] = root
+        if tree.root in tree.nodeList.keys():
+            tree.nodeList[tree.root].isRoot = True
+        else:
+            raise ParserError('Root Element with ID %s not found in node list' % tree.root)
+        return tree
+
+    @staticmethod
+    def bulkLoad(tree, nodes, edges):
+        """
+        Adds nodes and edges of a trusted file with Tree.bulkLoad
+
+        :param tree: Tree to add the nodes and edges to
+        :param nodes: Parsed nodes
+        :param edges: Edges as pairs of source id and destination id
+        :return: List of the violating edges, see Tree.bulkLoad
+        :raises ParserError: if a node can't be added or an edge refers to a node which does not exist
+        """
+        violations = tree.bulkLoad(nodes, edges)
+        if violations is None:
+            raise ParserError('Can\'t add node. %s' % tree.lastError)
+        for source, destination, reason in violations:
+            if source not in tree.nodeList:
+                raise ParserError('Source node %s does not exist' % source)
+            if destination not in tree.nodeList:
+                raise ParserError('Destination node %s does not exist' % destination)
+        return violations
+
+    @staticmethod
+    def saveToBinary(tree, file):
+        """
+        Saves a given tree as binary snapshot
+
+        :param tree: Tree to save to file
+        :param file: File to save to
+        :return: True if saving was successfully else returns exception
+        """
+        return BinaryHandler().saveTree(tree, file)
+
+    @staticmethod
+    def isBinary(file):
+        """
+        Checks if a file is a binary snapshot
+
+        :param file: File to check
+        :return: True if the file is a binary snapshot
+        """
+        return BinaryHandler.sniffFile(file)
+
+    @staticmethod
+    def checksum(file):
+        """
+        Calculates the checksum of a file, e.g. after saving it.
+        Files loaded with this checksum are trusted and not validated again
+
+        :param file: File to calculate the checksum for
+        :return: Checksum of the file
+        """
+        return XmlHandler.checksum(file)
 
 
 class Parsers:
@@ -72,19 +186,26 @@ class Parsers:
     @staticmethod
     def parseExtendedConnection(tree, edge):
         """
-        Parses a edge from a xml file
+        Parses a edge from a xml file.
+        Edges which are rejected by addEdge are stored in the violations of the tree,
+        edges which close a cycle are kept so the cycle is reported when the tree is saved
 
         :param tree: Tree to save generated files in
         :param edge: Edge to parse
         :raises ParserError: if edge can't be parsed
         """
-        if edge.get('source') in tree.nodeList.keys():
-            if edge.get('destination') in tree.nodeList.keys():
-                tree.addEdge(edge.get('source'), edge.get('destination'))
+        source = edge.get('source')
+        destination = edge.get('destination')
+        if source in tree.nodeList.keys():
+            if destination in tree.nodeList.keys():
+                if tree.addEdge(source, destination) is False:
+                    tree.violations.append((source, destination, tree.lastError))
+                    if tree.lastError == Tree.cycleError:
+                        tree.linkEdge(source, destination)
             else:
-                raise ParserError('Destination node %s does not exist' % edge.get('destination'))
+                raise ParserError('Destination node %s does not exist' % destination)
         else:
-            raise ParserError('Source node %s does not exist' % edge.get('source'))
+            raise ParserError('Source node %s does not exist' % source)
 
     @staticmethod
     def parseNode(node):
@@ -100,15 +221,13 @@ class Parsers:
 
             for a in node.findall('attribute'):
                 n.attributes[a.get('key')] = a.text
-            n.title = node.find('title').text
-            n.description = node.find('description').text
+            Parsers.parseTexts(n, node)
         elif node.tag == 'countermeasure':
             n = Countermeasure()
             n.id = node.get('id')
             for a in node.findall('attribute'):
                 n.attributes[a.get('key')] = a.text
-            n.title = node.find('title').text
-            n.description = node.find('description').text
+            Parsers.parseTexts(n, node)
         elif node.tag == 'alternative' or node.tag == 'composition' or node.tag == 'sequence' \
                 or node.tag == 'threshold':
             n = Conjunction(node.get('id'), node.tag)
@@ -118,6 +237,22 @@ class Parsers:
             raise ParserError('Parsing failed for element %s' % node.tag)
         return n
 
+    @staticmethod
+    def parseTexts(n, node):
+        """
+        Parses the title and the description of a node.
+        Missing elements are skipped, they are reported by the xsd validation
+
+        :param n: Node to save the texts in
+        :param node: Node to parse
+        """
+        title = node.find('title')
+        if title is not None:
+            n.title = title.text
+        description = node.find('description')
+        if description is not None:
+            n.description = description.text
+
     @staticmethod
     def parseExtendedNode(tree, node):
         """
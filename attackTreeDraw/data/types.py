@@ -1,4 +1,6 @@
+import collections
 import copy
+import heapq
 
 
 class Node:
@@ -6,6 +8,9 @@ class Node:
     Parent class for all nodes
     """
 
+    __slots__ = ('type', 'isRoot', 'id', 'title', 'description', 'attributes', 'parents', 'children', 'view',
+                 'position')
+
     def __init__(self):
         """
         Constructor for Node.
@@ -24,29 +29,19 @@ class Node:
         self.view = None
         self.position = None
 
-        self.visited = False
-        self.finished = False
-
-    def initDFS(self):
-        """
-        Initialises both variables for the dfs
-        """
-        self.visited = False
-        self.finished = False
-
 
 class Threat(Node):
     """
     Class for threat nodes
     """
-    pass
+    __slots__ = ()
 
 
 class Countermeasure(Node):
     """
     Class for countermeasure nodes
     """
-    pass
+    __slots__ = ()
 
 
 class Conjunction(Node):
@@ -54,6 +49,8 @@ class Conjunction(Node):
     Class for conjunction nodes
     """
 
+    __slots__ = ('conjunctionType',)
+
     def __init__(self, id=None, conjunctionType=None):
         """
         Constructor for conjunctions.
@@ -76,6 +73,8 @@ class Edge:
      The Class contains the source, destination and the conjunction for the edge
      """
 
+    __slots__ = ('source', 'destination')
+
     def __init__(self, source, destination):
         """
         Constructor for Node.
@@ -92,11 +91,292 @@ class Edge:
         return '%s-%s' % (self.source, self.destination)
 
 
+class IDAllocator:
+    """
+    Allocator for node ids in the format N[0-9]{4,}
+    Numbers below 10000 are padded to four digits, so ids of older files keep their format
+
+    Ids which were released are kept in a heap, so the lowest free id is always handed out first.
+    All other ids are handed out from a counter which skips ids that were reserved explicitly.
+    """
+
+    def __init__(self, size=None):
+        """
+        Constructor for IDAllocator
+
+        :param size: Number of available ids or None for no limit
+        """
+        self.size = size
+        self.used = set()
+        self.free = []
+        self.next = 0
+
+    @staticmethod
+    def toNumber(nodeId):
+        """
+        Converts a node id into its number
+
+        :param nodeId: Id of the node
+        :return: Number of the id or None if the id is not in the format N[0-9]{4,}
+        """
+        if isinstance(nodeId, str) and len(nodeId) > 4 and nodeId[0] == 'N' and nodeId[1:].isdigit() \
+                and (len(nodeId) == 5 or nodeId[1] != '0'):
+            return int(nodeId[1:])
+        return None
+
+    @staticmethod
+    def toID(number):
+        """
+        Converts a number into a node id
+
+        :param number: Number of the id
+        :return: Node id
+        """
+        return 'N' + str(number).zfill(4)
+
+    def peek(self):
+        """
+        Returns the next free id without reserving it
+
+        :return: next free id or None if there is no id left
+        """
+        while len(self.free) > 0 and self.free[0] in self.used:
+            heapq.heappop(self.free)
+        if len(self.free) > 0:
+            return self.toID(self.free[0])
+        while self.next in self.used:
+            self.next += 1
+        if self.size is not None and self.next >= self.size:
+            return None
+        return self.toID(self.next)
+
+    def allocate(self):
+        """
+        Reserves the next free id
+
+        :return: Reserved id or None if there is no id left
+        """
+        nodeId = self.peek()
+        if nodeId is not None:
+            self.used.add(self.toNumber(nodeId))
+        return nodeId
+
+    def allocateBulk(self, count):
+        """
+        Reserves several ids at once
+
+        :param count: Number of ids to reserve
+        :return: List of reserved ids or None if there are not enough ids left
+        """
+        ids = []
+        for i in range(count):
+            nodeId = self.allocate()
+            if nodeId is None:
+                for r in ids:
+                    self.release(r)
+                return None
+            ids.append(nodeId)
+        return ids
+
+    def reserve(self, nodeId):
+        """
+        Marks a given id as used
+
+        :param nodeId: Id to reserve
+        """
+        number = self.toNumber(nodeId)
+        if number is not None:
+            self.used.add(number)
+
+    def release(self, nodeId):
+        """
+        Marks a given id as free
+
+        :param nodeId: Id to release
+        """
+        number = self.toNumber(nodeId)
+        if number is not None and number in self.used:
+            self.used.remove(number)
+            if number < self.next:
+                heapq.heappush(self.free, number)
+
+
+class Journal:
+    """
+    Journal of the operations on a tree for undo and redo
+
+    Every operation is saved as tuple with the name of the operation and everything needed to revert it:
+    ('addNode', node), ('removeNode', node, wasRoot), ('addEdge', sourceId, destinationId),
+    ('removeEdge', sourceId, destinationId, childIndex, parentIndex), ('editNode', nodeId, oldValues, newValues),
+    ('moveNode', nodeId, oldPosition, newPosition)
+
+    Operations are grouped into actions, one action is reverted per undo.
+    Nothing is recorded before the first call of newAction, so building a tree from a file is not in the journal
+    """
+
+    def __init__(self, maxActions=100, coalesceMoves=True):
+        """
+        Constructor for Journal
+
+        :param maxActions: Maximum number of actions which can be undone
+        :param coalesceMoves: Merges actions which only contain moves into one action
+        """
+        self.undoStack = collections.deque(maxlen=maxActions)
+        self.redoStack = []
+        self.coalesceMoves = coalesceMoves
+        self.current = None
+        self.recording = False
+        self.applying = False
+
+    def newAction(self):
+        """
+        Starts a new action, all following operations are reverted together
+        """
+        self.recording = True
+        self.current = None
+
+    def record(self, operation):
+        """
+        Records an operation in the current action.
+        Every new operation clears the redo stack
+
+        :param operation: Operation tuple
+        """
+        if self.recording is False or self.applying is True:
+            return
+        self.redoStack = []
+        if operation[0] == 'moveNode' and self.coalesceMoves is True and len(self.undoStack) > 0 \
+                and (self.current is None or self.current is self.undoStack[-1]) \
+                and all(o[0] == 'moveNode' for o in self.undoStack[-1]):
+            for i, o in enumerate(self.undoStack[-1]):
+                if o[1] == operation[1]:
+                    self.undoStack[-1][i] = (o[0], o[1], o[2], operation[3])
+                    return
+            self.undoStack[-1].append(operation)
+            self.current = self.undoStack[-1]
+            return
+        if self.current is None:
+            self.current = []
+            self.undoStack.append(self.current)
+        self.current.append(operation)
+
+    def canUndo(self):
+        """
+        :return: True if there is an action to undo
+        """
+        return len(self.undoStack) > 0
+
+    def canRedo(self):
+        """
+        :return: True if there is an action to redo
+        """
+        return len(self.redoStack) > 0
+
+    def undo(self, tree):
+        """
+        Reverts the last action
+
+        :param tree: Tree the journal belongs to
+        :return: True if an action was reverted
+        """
+        if len(self.undoStack) == 0:
+            return False
+        action = self.undoStack.pop()
+        self.applying = True
+        try:
+            for operation in reversed(action):
+                self.apply(tree, operation, True)
+        finally:
+            self.applying = False
+        self.redoStack.append(action)
+        self.current = None
+        return True
+
+    def redo(self, tree):
+        """
+        Applies the last reverted action again
+
+        :param tree: Tree the journal belongs to
+        :return: True if an action was applied
+        """
+        if len(self.redoStack) == 0:
+            return False
+        action = self.redoStack.pop()
+        self.applying = True
+        try:
+            for operation in action:
+                self.apply(tree, operation, False)
+        finally:
+            self.applying = False
+        self.undoStack.append(action)
+        self.current = None
+        return True
+
+    @staticmethod
+    def getNodeIds(action):
+        """
+        Returns the ids of all nodes which are changed by an action, including both nodes of added or removed edges
+
+        :param action: List of operation tuples
+        :return: Set of node ids
+        """
+        nodeIds = set()
+        for operation in action:
+            if operation[0] == 'addNode' or operation[0] == 'removeNode':
+                nodeIds.add(operation[1].id)
+            else:
+                nodeIds.add(operation[1])
+                if operation[0] == 'addEdge' or operation[0] == 'removeEdge':
+                    nodeIds.add(operation[2])
+        return nodeIds
+
+    @staticmethod
+    def apply(tree, operation, inverse):
+        """
+        Applies an operation or its inverse to a tree
+
+        :param tree: Tree to apply the operation to
+        :param operation: Operation tuple
+        :param inverse: True to revert the operation
+        """
+        kind = operation[0]
+        if (kind == 'addNode' and inverse is False) or (kind == 'removeNode' and inverse is True):
+            node = operation[1]
+            node.parents = []
+            node.children = []
+            tree.addNode(node)
+            if kind == 'removeNode' and operation[2] is True:
+                node.isRoot = True
+                tree.root = node.id
+        elif kind == 'addNode' or kind == 'removeNode':
+            tree.removeNode(operation[1].id)
+        elif (kind == 'addEdge' and inverse is False) or (kind == 'removeEdge' and inverse is True):
+            tree.linkEdge(operation[1], operation[2])
+            if kind == 'removeEdge':
+                children = tree.nodeList[operation[1]].children
+                children.insert(operation[3], children.pop())
+                parents = tree.nodeList[operation[2]].parents
+                parents.insert(operation[4], parents.pop())
+        elif kind == 'addEdge' or kind == 'removeEdge':
+            tree.removeEdge(operation[1] + '-' + operation[2])
+        elif kind == 'editNode':
+            node = tree.nodeList[operation[1]]
+            for k, v in (operation[2] if inverse is True else operation[3]).items():
+                setattr(node, k, v)
+        elif kind == 'moveNode':
+            tree.nodeList[operation[1]].position = operation[2] if inverse is True else operation[3]
+
+
 class Tree:
     """
     Class which moulds the tree
     """
 
+    """
+    Reason of addEdge and bulkLoad for edges which close a cycle
+    """
+    cycleError = 'Edge would create a cycle'
+
     def __init__(self, extended):
         """
         Constructor for Tree
@@ -107,7 +387,10 @@ class Tree:
         self.extended = extended
 
         self.nodeList = {}
-        self.edgeList = []
+        """
+        Dictionary of all edges, keyed by the edge id (see Edge.__hash__)
+        """
+        self.edges = {}
         self.extended = False
         self.falseNodes = []
         self.cycleNode = None
@@ -117,8 +400,47 @@ class Tree:
         List for reserved nodeIDs while copy/paste is active
         """
         self.reservedList = []
+        self.idAllocator = IDAllocator()
+        """
+        Caches for the resolved types of conjunctions, see getTypeRecursiveDown and getTypeRecursiveUp
+        """
+        self.typeDownCache = {}
+        self.typeUpCache = {}
+        """
+        Topological order of the nodes, maintained on every inserted edge.
+        acyclic is False if an edge was linked which closes a cycle, then the order is rebuilt by checkCycle.
+        Until then new edges are checked with reaches
+        """
+        self.order = {}
+        self.nextOrder = 0
+        self.acyclic = True
 
         self.lastError = ''
+        """
+        Edges of the loaded file which break the rules, close a cycle or can't be inserted, see bulkLoad
+        """
+        self.violations = []
+
+        self.journal = Journal()
+
+    @property
+    def edgeList(self):
+        """
+        List of all edges in insertion order
+
+        :return: list of edges
+        """
+        return list(self.edges.values())
+
+    def getEdge(self, sourceId, destinationId):
+        """
+        Returns the edge between two nodes
+
+        :param sourceId: Id of the source node
+        :param destinationId: Id of the destination node
+        :return: Edge or None if there is no such edge
+        """
+        return self.edges.get('%s-%s' % (sourceId, destinationId))
 
     def getTypeRecursiveDown(self, node):
         """
@@ -126,18 +448,12 @@ class Tree:
         The function searches downwards.
         If there was no other element it will return Conjunction
 
+        The result is cached for every conjunction on the way down
+
         :param node: Node to start the search from
         :return: Type of node
         """
-        if isinstance(node, Conjunction):
-            for c in node.children:
-                if isinstance(self.nodeList[c], Conjunction):
-                    return self.getTypeRecursiveDown(self.nodeList[c])
-                else:
-                    return type(self.nodeList[c])
-            return type(node)
-        else:
-            return type(node)
+        return self.resolveConjunctionType(node, self.typeDownCache, 'children')
 
     def getTypeRecursiveUp(self, node):
         """
@@ -145,18 +461,67 @@ class Tree:
         The function searches upwards.
         If there was no other element it will return Conjunction
 
+        The result is cached for every conjunction on the way up
+
         :param node: Node to start the search from
         :return: Type of node
         """
-        if isinstance(node, Conjunction):
-            for c in node.parents:
-                if isinstance(self.nodeList[c], Conjunction):
-                    return self.getTypeRecursiveUp(self.nodeList[c])
-                else:
-                    return type(self.nodeList[c])
-            return type(node)
-        else:
+        return self.resolveConjunctionType(node, self.typeUpCache, 'parents')
+
+    def resolveConjunctionType(self, node, cache, direction):
+        """
+        Follows the first child or parent of conjunctions until a node is found which is not a Conjunction
+
+        :param node: Node to start the search from
+        :param cache: Cache for the search direction
+        :param direction: 'children' or 'parents'
+        :return: Type of the first node which is not a Conjunction or Conjunction
+        """
+        if not isinstance(node, Conjunction):
             return type(node)
+        chain = []
+        visited = set()
+        current = node
+        while True:
+            if current.id in cache:
+                resolved = cache[current.id]
+                break
+            chain.append(current.id)
+            visited.add(current.id)
+            neighbours = getattr(current, direction)
+            if len(neighbours) == 0 or neighbours[0] in visited:
+                resolved = type(current)
+                break
+            nextNode = self.nodeList[neighbours[0]]
+            if not isinstance(nextNode, Conjunction):
+                resolved = type(nextNode)
+                break
+            current = nextNode
+        for nodeId in chain:
+            if nodeId in self.nodeList:
+                cache[nodeId] = resolved
+        return resolved
+
+    def invalidateTypeCache(self, sourceId, destinationId):
+        """
+        Removes the cached conjunction types which depend on the edge from source to destination.
+        The downwards type changes for the source and all conjunctions above which reach it as first child,
+        the upwards type for the destination and all conjunctions below which reach it as first parent.
+
+        :param sourceId: Id of the source node
+        :param destinationId: Id of the destination node
+        """
+        for cache, startId, direction, back in ((self.typeDownCache, sourceId, 'parents', 'children'),
+                                                (self.typeUpCache, destinationId, 'children', 'parents')):
+            stack = [startId]
+            while len(stack) > 0:
+                nodeId = stack.pop()
+                if cache.pop(nodeId, None) is None:
+                    continue
+                for n in getattr(self.nodeList[nodeId], direction):
+                    neighbour = self.nodeList[n]
+                    if isinstance(neighbour, Conjunction) and getattr(neighbour, back)[0] == nodeId:
+                        stack.append(n)
 
     def getFirstElementRecursiveDown(self, node):
         """
@@ -204,14 +569,19 @@ class Tree:
         :return: True if succeed else false
         """
         if node.id is None:
-            node.id = self.getNextID()
+            node.id = self.idAllocator.allocate()
             if node.id is None:
                 self.lastError = 'No free node IDs left'
                 return False
-        if node.id in self.nodeList:
+        elif node.id in self.nodeList:
             self.lastError = 'Node ID already in tree'
             return False
+        else:
+            self.idAllocator.reserve(node.id)
         self.nodeList[node.id] = node
+        self.order[node.id] = self.nextOrder
+        self.nextOrder += 1
+        self.journal.record(('addNode', node))
         return True
 
     def addEdge(self, sourceId, destinationId):
@@ -220,53 +590,149 @@ class Tree:
 
         :param sourceId: Id of the source node
         :param destinationId: Id of the destination node
-        :return: True if add was successful else false
+        :return: True if add was successful else false, the reason is stored in lastError
         """
         if sourceId not in self.nodeList:
+            self.lastError = 'Source node %s does not exist' % sourceId
             return False
         if destinationId not in self.nodeList:
+            self.lastError = 'Destination node %s does not exist' % destinationId
             return False
 
         source = self.nodeList[sourceId]
         destination = self.nodeList[destinationId]
 
         edge = Edge(sourceId, destinationId)
-        for c in self.edgeList:
-            if edge.__hash__() == c.__hash__():
-                return False
+        if edge.__hash__() in self.edges:
+            self.lastError = 'Edge already exists'
+            return False
 
         if destinationId == sourceId:
+            self.lastError = 'Edge to the node itself'
             return False
 
-        if self.getTypeRecursiveUp(source) is Countermeasure and self.getTypeRecursiveDown(destination) is Threat:
-            return False
-        if isinstance(source, Conjunction) and isinstance(destination, Conjunction) \
-                and self.getTypeRecursiveDown(source) is not Conjunction \
-                and self.getTypeRecursiveDown(destination) is not Conjunction \
-                and self.getTypeRecursiveDown(source) is not self.getTypeRecursiveDown(destination):
+        reason = self.checkRules(source, destination, len(source.children) > 0)
+        if reason is not None:
+            self.lastError = reason
             return False
-        if not isinstance(source, Conjunction) and len(source.children) > 0 \
-                and self.getTypeRecursiveDown(source) is Threat and self.getTypeRecursiveDown(destination) is Threat:
-            return False
-        if not isinstance(source, Conjunction) and len(source.children) > 0 \
-                and self.getTypeRecursiveDown(source) is Countermeasure \
-                and self.getTypeRecursiveDown(destination) is Countermeasure:
-            return False
-        if not isinstance(source, Conjunction) and len(source.children) > 0 \
-                and self.getTypeRecursiveDown(source) is Countermeasure and isinstance(destination, Conjunction):
+
+        if self.acyclic is True:
+            closesCycle = self.updateOrder(sourceId, destinationId) is False
+        else:
+            closesCycle = self.reaches(destinationId, sourceId)
+        if closesCycle is True:
+            self.cycleNode = source
+            self.lastError = self.cycleError
             return False
-        if self.getTypeRecursiveUp(source) is not Conjunction and self.getTypeRecursiveDown(destination) is Conjunction:
-            for c in self.getFirstElementRecursiveUp(source).children:
-                if self.getTypeRecursiveDown(destination) is not Conjunction \
-                        and self.getTypeRecursiveDown(self.nodeList[c]) is self.getTypeRecursiveDown(destination):
-                    return False
 
-        self.edgeList.append(edge)
-        self.nodeList[edge.source].children.append(edge.destination)
-        self.nodeList[edge.destination].parents.append(edge.source)
+        self.linkEdge(sourceId, destinationId, False)
 
         return True
 
+    def checkRules(self, source, destination, hasChildren):
+        """
+        Checks the rules for an edge between a Threat, Countermeasure and Conjunction
+
+        :param source: Source node
+        :param destination: Destination node
+        :param hasChildren: True if the source has other children than the destination
+        :return: Broken rule or None if the edge is allowed
+        """
+        destinationType = self.getTypeRecursiveDown(destination)
+        if self.getTypeRecursiveUp(source) is Countermeasure and destinationType is Threat:
+            return 'Countermeasure can\'t have a threat as child'
+        if isinstance(source, Conjunction):
+            if isinstance(destination, Conjunction) and destinationType is not Conjunction \
+                    and self.getTypeRecursiveDown(source) not in (Conjunction, destinationType):
+                return 'Conjunctions with different types can\'t be connected'
+            return None
+        if hasChildren is True and isinstance(source, Threat) and destinationType is Threat:
+            return 'Threat can have only one threat as child'
+        if hasChildren is True and isinstance(source, Countermeasure) \
+                and (destinationType is Countermeasure or isinstance(destination, Conjunction)):
+            return 'Countermeasure can have only one child'
+        return None
+
+    def bulkLoad(self, nodes, edges):
+        """
+        Inserts many nodes and edges at once, e.g. from trusted files.
+        The edges are checked against the rules of addEdge in the given order,
+        only the check for cycles is done once for the whole graph afterwards.
+
+        Edges to unknown nodes, duplicates, edges to the node itself and edges which break the rules are not inserted.
+        Edges which close a cycle are kept and the tree is marked as not acyclic, so checkCycle reports the cycle.
+        All of them are reported and stored in violations
+
+        :param nodes: Nodes to add
+        :param edges: Edges to add as pairs of source id and destination id
+        :return: List of the violating edges as (sourceId, destinationId, reason) or None if a node can't be added
+        """
+        for node in nodes:
+            if node.id is not None and node.id not in self.nodeList:
+                self.nodeList[node.id] = node
+                self.idAllocator.reserve(node.id)
+            elif self.addNode(node) is False:
+                return None
+
+        violations = []
+        self.typeDownCache = {}
+        self.typeUpCache = {}
+        for sourceId, destinationId in edges:
+            if sourceId not in self.nodeList or destinationId not in self.nodeList:
+                violations.append((sourceId, destinationId, 'Node does not exist'))
+                continue
+            if sourceId == destinationId:
+                violations.append((sourceId, destinationId, 'Edge to the node itself'))
+                continue
+            if '%s-%s' % (sourceId, destinationId) in self.edges:
+                violations.append((sourceId, destinationId, 'Edge already exists'))
+                continue
+            source = self.nodeList[sourceId]
+            reason = self.checkRules(source, self.nodeList[destinationId], len(source.children) > 0)
+            if reason is not None:
+                violations.append((sourceId, destinationId, reason))
+                continue
+            edge = Edge(sourceId, destinationId)
+            self.edges[edge.__hash__()] = edge
+            self.invalidateTypeCache(sourceId, destinationId)
+            source.children.append(destinationId)
+            self.nodeList[destinationId].parents.append(sourceId)
+
+        finished, backEdges = self.depthFirstSearch()
+        for sourceId, destinationId in backEdges:
+            violations.append((sourceId, destinationId, self.cycleError))
+        self.setOrder(finished)
+        self.acyclic = len(backEdges) == 0
+        if self.acyclic is False:
+            self.cycleNode = self.nodeList[backEdges[0][1]]
+
+        if len(violations) > 0:
+            self.lastError = '%d edges violate the rules of the tree' % len(violations)
+        self.violations = violations
+        return violations
+
+    def linkEdge(self, sourceId, destinationId, updateOrder=True):
+        """
+        Inserts an edge without checking the rules of addEdge.
+        Used for edges which are known to be valid, e.g. copies of existing edges
+
+        :param sourceId: Id of the source node
+        :param destinationId: Id of the destination node
+        :param updateOrder: False if the topological order was already updated for this edge
+        :return: The inserted edge
+        """
+        if updateOrder is True and self.acyclic is True and self.updateOrder(sourceId, destinationId) is False:
+            self.acyclic = False
+        edge = Edge(sourceId, destinationId)
+        self.edges[edge.__hash__()] = edge
+        self.invalidateTypeCache(sourceId, destinationId)
+        if destinationId not in self.nodeList[sourceId].children:
+            self.nodeList[sourceId].children.append(destinationId)
+        if sourceId not in self.nodeList[destinationId].parents:
+            self.nodeList[destinationId].parents.append(sourceId)
+        self.journal.record(('addEdge', sourceId, destinationId))
+        return edge
+
     def checkMeta(self):
         """
         Checks if the needed meta information are there
@@ -310,53 +776,208 @@ class Tree:
         self.extended = False
         return False
 
-    def checkCycle(self):
+    def updateOrder(self, sourceId, destinationId):
         """
-        Checks if the tree has a cycle with the dfs
-        :return: True if the tree has no cycle else false
+        Updates the topological order for a new edge (online topological ordering by Pearce and Kelly).
+        Only the nodes between the destination and the source in the current order are visited and reordered.
+
+        :param sourceId: Id of the source node
+        :param destinationId: Id of the destination node
+        :return: False if the edge would create a cycle else True
         """
-        for k, n in self.nodeList.items():
-            n.initDFS()
-        for k, n in self.nodeList.items():
-            c = self.dfs(n)
-            if c is not True:
-                return False
+        if sourceId == destinationId:
+            return False
+        for nodeId in (sourceId, destinationId):
+            if nodeId not in self.order:
+                self.order[nodeId] = self.nextOrder
+                self.nextOrder += 1
+        lower = self.order[destinationId]
+        upper = self.order[sourceId]
+        if upper < lower:
+            return True
+
+        forward = []
+        seen = {destinationId}
+        stack = [destinationId]
+        while len(stack) > 0:
+            nodeId = stack.pop()
+            forward.append(nodeId)
+            for c in self.nodeList[nodeId].children:
+                if c == sourceId:
+                    self.cycleNode = self.nodeList[sourceId]
+                    return False
+                if c not in seen and self.order[c] < upper:
+                    seen.add(c)
+                    stack.append(c)
+
+        backward = []
+        seen = {sourceId}
+        stack = [sourceId]
+        while len(stack) > 0:
+            nodeId = stack.pop()
+            backward.append(nodeId)
+            for p in self.nodeList[nodeId].parents:
+                if p not in seen and self.order[p] > lower:
+                    seen.add(p)
+                    stack.append(p)
+
+        forward.sort(key=self.order.get)
+        backward.sort(key=self.order.get)
+        nodes = backward + forward
+        for nodeId, position in zip(nodes, sorted(self.order[n] for n in nodes)):
+            self.order[nodeId] = position
         return True
 
-    def dfs(self, node):
+    def reaches(self, startId, targetId):
         """
-        Depth-first search to check the tree for a cycle
+        Checks if there is a path from start to target with an iterative dfs.
+        Only the nodes below the start are visited.
+        Used instead of the topological order for new edges while the tree has a cycle
 
-        :param node: Node to check
-        :return: True if node is finished false if a cycle is detected
+        :param startId: Id of the node to start the search from
+        :param targetId: Id of the node to search for
+        :return: True if the target is reachable from the start else false
         """
-        if node.finished:
+        seen = {startId}
+        stack = [startId]
+        while len(stack) > 0:
+            nodeId = stack.pop()
+            if nodeId == targetId:
+                return True
+            for c in self.nodeList[nodeId].children:
+                if c not in seen:
+                    seen.add(c)
+                    stack.append(c)
+        return False
+
+    def checkCycle(self):
+        """
+        Checks if the tree has a cycle with an iterative dfs.
+        If the topological order is maintained there can't be a cycle and no search is needed.
+        Otherwise the order is rebuilt from the dfs if the tree has no cycle
+
+        :return: True if the tree has no cycle else false
+        """
+        if self.acyclic is True:
             return True
-        if node.visited:
-            self.cycleNode = node
+        finished, backEdges = self.depthFirstSearch(True)
+        if len(backEdges) > 0:
+            self.cycleNode = self.nodeList[backEdges[0][1]]
             return False
-        node.visited = True
-        for subN in node.children:
-            c = self.dfs(self.nodeList[subN])
-            if c is not True:
-                return False
-        node.finished = True
+        self.setOrder(finished)
+        self.acyclic = True
         return True
 
-    def getNextID(self, keyList=None):
+    def getComponents(self):
+        """
+        Splits the tree into its weakly connected parts, e.g. independent attack scenarios in one file
+
+        :return: List of lists with the ids of the nodes of every part, the part of the root is the first one
+        """
+        components = []
+        seen = set()
+        starts = list(self.nodeList)
+        if self.root in self.nodeList:
+            starts.insert(0, self.root)
+        for start in starts:
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            stack = [start]
+            while len(stack) > 0:
+                node = self.nodeList[stack.pop()]
+                for n in node.children + node.parents:
+                    if n not in seen:
+                        seen.add(n)
+                        component.append(n)
+                        stack.append(n)
+            components.append(component)
+        return components
+
+    def depthFirstSearch(self, stopAtCycle=False):
+        """
+        Iterative dfs over all nodes, which finds the edges closing a cycle (back edges)
+
+        :param stopAtCycle: Stops the search at the first back edge
+        :return: List of node ids in the order they were finished, list of back edges as (sourceId, destinationId)
+        """
+        finished = []
+        backEdges = []
+        state = {}
+        for start in self.nodeList:
+            if start in state:
+                continue
+            state[start] = False
+            stack = [(start, iter(self.nodeList[start].children))]
+            while len(stack) > 0:
+                nodeId, children = stack[-1]
+                for c in children:
+                    if c not in state:
+                        state[c] = False
+                        stack.append((c, iter(self.nodeList[c].children)))
+                        break
+                    if state[c] is False:
+                        backEdges.append((nodeId, c))
+                        if stopAtCycle is True:
+                            return finished, backEdges
+                else:
+                    state[nodeId] = True
+                    finished.append(nodeId)
+                    stack.pop()
+        return finished, backEdges
+
+    def setOrder(self, finished):
         """
-        Gets the next free id for a node in the format N[0-9]{4}
+        Sets the topological order from the finishing order of a dfs without back edges
+
+        :param finished: Node ids in the order they were finished
+        """
+        self.order = {}
+        for position, nodeId in enumerate(reversed(finished)):
+            self.order[nodeId] = position
+        self.nextOrder = len(finished)
+
+    def getNextID(self):
+        """
+        Gets the next free id for a node in the format N[0-9]{4,}
 
-        :param: keyList list of keys already used
         :return: next free node id
         """
-        if keyList is None:
-            keyList = []
-        for i in range(10000):
-            if 'N' + str(i).zfill(4) not in self.nodeList.keys() and 'N' + str(i).zfill(4) not in keyList \
-                    and 'N' + str(i).zfill(4) not in self.reservedList:
-                return 'N' + str(i).zfill(4)
-        return None
+        return self.idAllocator.peek()
+
+    def reserveIDs(self, count):
+        """
+        Reserves ids for nodes which are not in the tree yet, e.g. nodes in the copy buffer.
+        The reserved ids are saved in reservedList
+
+        :param count: Number of ids to reserve
+        :return: List of reserved ids or None if there are not enough ids left
+        """
+        ids = self.idAllocator.allocateBulk(count)
+        if ids is None:
+            self.lastError = 'No free node IDs left'
+            return None
+        self.reservedList.extend(ids)
+        return ids
+
+    def reserveID(self, nodeId):
+        """
+        Reserves a given id and saves it in reservedList
+
+        :param nodeId: Id to reserve
+        """
+        self.idAllocator.reserve(nodeId)
+        self.reservedList.append(nodeId)
+
+    def releaseReservedIDs(self):
+        """
+        Releases all reserved ids which are not used by a node in the tree
+        """
+        for nodeId in self.reservedList:
+            if nodeId not in self.nodeList:
+                self.idAllocator.release(nodeId)
+        self.reservedList = []
 
     def removeNode(self, nodeId):
         """
@@ -371,9 +992,17 @@ class Tree:
             children = copy.copy(self.nodeList[nodeId].children)
             for i in children:
                 self.removeEdge(nodeId + '-' + i)
-            if self.nodeList[nodeId].isRoot:
+            node = self.nodeList[nodeId]
+            wasRoot = node.isRoot is True and self.root == nodeId
+            if node.isRoot:
                 self.root = None
+            self.journal.record(('removeNode', node, wasRoot))
             del self.nodeList[nodeId]
+            self.order.pop(nodeId, None)
+            self.typeDownCache.pop(nodeId, None)
+            self.typeUpCache.pop(nodeId, None)
+            if nodeId not in self.reservedList:
+                self.idAllocator.release(nodeId)
             return True
         else:
             return False
@@ -385,41 +1014,134 @@ class Tree:
         :param edgeId: Id of the edge (hash)
         :return: True if successful else false
         """
-        edge = None
-        for e in self.edgeList:
-            if edgeId == e.__hash__():
-                edge = e
-                break
+        edge = self.edges.pop(edgeId, None)
         if edge is not None:
-            self.nodeList[edge.source].children.remove(edge.destination)
-            self.nodeList[edge.destination].parents.remove(edge.source)
-            self.edgeList.remove(edge)
+            self.invalidateTypeCache(edge.source, edge.destination)
+            source = self.nodeList[edge.source]
+            destination = self.nodeList[edge.destination]
+            self.journal.record(('removeEdge', edge.source, edge.destination,
+                                 source.children.index(edge.destination), destination.parents.index(edge.source)))
+            source.children.remove(edge.destination)
+            destination.parents.remove(edge.source)
             return True
         else:
             return False
 
-    def makeSimple(self):
+    def editNode(self, nodeId, values):
+        """
+        Changes the values of a node, e.g. title, description, attributes or conjunctionType
+
+        :param nodeId: Id of the node
+        :param values: Dictionary with the name of the value as key and the new value
+        :return: True if successful else false
+        """
+        if nodeId not in self.nodeList:
+            return False
+        node = self.nodeList[nodeId]
+        oldValues = {}
+        for k, v in values.items():
+            oldValues[k] = getattr(node, k)
+            setattr(node, k, v)
+        self.journal.record(('editNode', nodeId, oldValues, dict(values)))
+        return True
+
+    def moveNode(self, nodeId, position):
+        """
+        Sets the position of a node
+
+        :param nodeId: Id of the node
+        :param position: Tuple (x, y)
+        :return: True if successful else false
+        """
+        if nodeId not in self.nodeList:
+            return False
+        node = self.nodeList[nodeId]
+        if node.position == position:
+            return True
+        self.journal.record(('moveNode', nodeId, node.position, position))
+        node.position = position
+        return True
+
+    def getSubtreeSizes(self):
+        """
+        Calculates for every node the number of nodes in its subtree if all shared nodes were copied.
+        The tree must not contain a cycle
+
+        :return: Dictionary with the node id as key and the size as value
+        """
+        sizes = {}
+        for nodeId in sorted(self.nodeList, key=self.order.get, reverse=True):
+            sizes[nodeId] = 1 + sum(sizes[c] for c in self.nodeList[nodeId].children)
+        return sizes
+
+    def getSimpleSize(self):
+        """
+        Returns the number of nodes the tree will have after makeSimple
+
+        :return: Number of nodes or None if the tree has a cycle
+        """
+        if self.checkCycle() is False:
+            return None
+        sizes = self.getSubtreeSizes()
+        return sum(sizes[k] for k, n in self.nodeList.items() if len(n.parents) == 0)
+
+    def cloneSubtree(self, nodeId):
+        """
+        Copies a node and all nodes below it.
+        Nodes which are reached on more than one way are copied for every way
+
+        :param nodeId: Id of the node to copy
+        :return: Id of the copy
+        """
+        cloneId = self.cloneNode(nodeId)
+        stack = [(nodeId, cloneId)]
+        while len(stack) > 0:
+            originalId, copyId = stack.pop()
+            for c in self.nodeList[originalId].children:
+                childCopyId = self.cloneNode(c)
+                self.linkEdge(copyId, childCopyId)
+                stack.append((c, childCopyId))
+        return cloneId
+
+    def cloneNode(self, nodeId):
+        """
+        Copies a single node without its edges and adds it to the tree
+
+        :param nodeId: Id of the node to copy
+        :return: Id of the copy
+        """
+        newNode = copy.copy(self.nodeList[nodeId])
+        newNode.id = None
+        newNode.isRoot = False
+        newNode.attributes = copy.copy(newNode.attributes)
+        newNode.parents = []
+        newNode.children = []
+        newNode.view = None
+        newNode.position = None
+        self.addNode(newNode)
+        return newNode.id
+
+    def makeSimple(self, maxSize=None):
         """
         Generates an simple tree out of an extended one.
 
-        Copies every element with two or more parents.
+        Every element with two or more parents keeps its first parent,
+        for every other parent a copy of the element and its subtree is added.
+        The nodes are visited once in topological order, so the parents are always handled before their children
+
+        :param maxSize: Maximum number of nodes for the simple tree, None for no limit
+        :return: True if succeed else false
         """
-        nodeList = copy.copy(self.nodeList)
-        changed = False
-        for node in nodeList.values():
-            if len(node.parents) > 1:
-                newNode = copy.copy(node)
-                newNode.id = None
-                newNode.parents = []
-                newNode.children = []
-                self.addNode(newNode)
-                parent = node.parents[-1]
-                self.removeEdge(node.parents[-1] + '-' + node.id)
-                self.addEdge(parent, newNode.id)
-                newNode.children = copy.copy(node.children)
-                for c in newNode.children:
-                    self.edgeList.append(Edge(newNode.id, c))
-                    self.nodeList[c].parents.append(newNode.id)
-                changed = True
-        if changed is True:
-            self.makeSimple()
+        size = self.getSimpleSize()
+        if size is None:
+            self.lastError = 'The tree has a cycle at node %s' % self.cycleNode.id
+            return False
+        if maxSize is not None and size > maxSize:
+            self.lastError = 'The simple tree would have %d nodes' % size
+            return False
+        for nodeId in sorted(self.nodeList, key=self.order.get):
+            node = self.nodeList[nodeId]
+            for parentId in node.parents[1:]:
+                self.removeEdge(parentId + '-' + nodeId)
+                self.linkEdge(parentId, self.cloneSubtree(nodeId))
+        return True
@@ -0,0 +1,240 @@
+import mmap
+import struct
+
+from data.exceptions import ParserError
+from data.types import Countermeasure, Conjunction, Threat
+
+
+class Handler:
+    """
+    This class handles the binary snapshot format for trees
+
+    A snapshot is a little endian file with the following sections:
+        header:      magic, version, flags, number of strings, meta entries, nodes, attributes and edges, root index
+        strings:     offsets (number of strings + 1) followed by all strings utf-8 encoded
+        meta:        pairs of string indices (key, value)
+        nodes:       kind, string indices of id, title and description, first attribute and number of attributes
+        attributes:  pairs of string indices (key, value)
+        edges:       all source node indices followed by all destination node indices
+
+    None is stored as the string index noString.
+    For conjunctions the title holds the conjunction type.
+    """
+
+    """
+    Magic bytes at the beginning of every snapshot
+    """
+    magic = b'ATDB'
+
+    """
+    Version of the format which is written, files with another version are rejected
+    """
+    version = 1
+
+    """
+    Flag for trees in the extended mode
+    """
+    flagExtended = 1
+
+    """
+    String index for None
+    """
+    noString = 0xFFFFFFFF
+
+    """
+    Kinds of the nodes in the node section
+    """
+    kindThreat = 0
+    kindCountermeasure = 1
+    kindConjunction = 2
+
+    header = struct.Struct('<4sHHIIIIIi')
+    pair = struct.Struct('<II')
+    node = struct.Struct('<BIIIII')
+
+    def __init__(self):
+        """
+        Constructor for Handler
+        """
+        self.strings = []
+        self.stringIndex = {}
+
+    def addString(self, string):
+        """
+        Adds a string to the string table, every string is saved only once
+
+        :param string: String to add
+        :return: Index of the string
+        """
+        if string is None:
+            return self.noString
+        index = self.stringIndex.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self.stringIndex[string] = index
+        return index
+
+    def saveTree(self, tree, file):
+        """
+        Saves a tree as binary snapshot
+
+        :param tree: Tree to save
+        :param file: File to save to
+        :return: True if saving was successfully else returns exception
+        """
+        self.strings = []
+        self.stringIndex = {}
+
+        meta = bytearray()
+        for k, v in tree.meta.items():
+            if k == 'root':
+                continue
+            meta += self.pair.pack(self.addString(k), self.addString(v))
+
+        nodeIndex = {}
+        nodes = bytearray()
+        attributes = bytearray()
+        attributeCount = 0
+        for n in tree.nodeList.values():
+            nodeIndex[n.id] = len(nodeIndex)
+            if isinstance(n, Countermeasure):
+                kind = self.kindCountermeasure
+            elif isinstance(n, Threat):
+                kind = self.kindThreat
+            else:
+                kind = self.kindConjunction
+            if kind == self.kindConjunction:
+                nodes += self.node.pack(kind, self.addString(n.id), self.addString(n.conjunctionType), self.noString,
+                                        attributeCount, 0)
+                continue
+            nodes += self.node.pack(kind, self.addString(n.id), self.addString(n.title),
+                                    self.addString(n.description), attributeCount, len(n.attributes))
+            for k, v in n.attributes.items():
+                attributes += self.pair.pack(self.addString(k), self.addString(v))
+            attributeCount += len(n.attributes)
+
+        edgeCount = len(tree.edges)
+        edges = struct.pack('<%dI' % edgeCount, *(nodeIndex[e.source] for e in tree.edges.values()))
+        edges += struct.pack('<%dI' % edgeCount, *(nodeIndex[e.destination] for e in tree.edges.values()))
+
+        encoded = [s.encode('utf-8') for s in self.strings]
+        offsets = [0]
+        for s in encoded:
+            offsets.append(offsets[-1] + len(s))
+
+        flags = self.flagExtended if tree.extended else 0
+        root = nodeIndex.get(tree.root, -1)
+        try:
+            with open(file, 'wb') as fp:
+                fp.write(self.header.pack(self.magic, self.version, flags, len(encoded), len(meta) // self.pair.size,
+                                          len(nodeIndex), attributeCount, edgeCount, root))
+                fp.write(struct.pack('<%dI' % len(offsets), *offsets))
+                fp.write(b''.join(encoded))
+                fp.write(meta)
+                fp.write(nodes)
+                fp.write(attributes)
+                fp.write(edges)
+        except Exception as e:
+            return e
+        return True
+
+    def loadFile(self, file):
+        """
+        Loads a binary snapshot. The file is memory mapped and every string of the string table is decoded once
+
+        :param file: File to load
+        :return: extended flag, meta information, list of nodes, list of edges as pairs of node ids and the root id
+        :raises ParserError: if the file can't be read or is no valid snapshot
+        """
+        try:
+            with open(file, 'rb') as fp:
+                with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return self.parse(mm)
+        except (OSError, ValueError) as e:
+            raise ParserError('Can\'t load %s: %s' % (file, e))
+        except struct.error:
+            raise ParserError('Snapshot %s is truncated' % file)
+
+    def parse(self, buffer):
+        """
+        Parses a binary snapshot
+
+        :param buffer: Buffer with the snapshot
+        :return: extended flag, meta information, list of nodes, list of edges as pairs of node ids and the root id
+        :raises ParserError: if the buffer contains no valid snapshot
+        """
+        magic, version, flags, stringCount, metaCount, nodeCount, attributeCount, edgeCount, root = \
+            self.header.unpack_from(buffer, 0)
+        if magic != self.magic:
+            raise ParserError('File is no attack tree snapshot')
+        if version != self.version:
+            raise ParserError('Snapshot version %d is not supported' % version)
+        offset = self.header.size
+
+        offsets = struct.unpack_from('<%dI' % (stringCount + 1), buffer, offset)
+        offset += 4 * (stringCount + 1)
+        if offset + offsets[-1] > len(buffer):
+            raise ParserError('Snapshot is truncated')
+        strings = [buffer[offset + offsets[i]:offset + offsets[i + 1]].decode('utf-8') for i in range(stringCount)]
+        offset += offsets[-1]
+
+        def string(index):
+            if index == self.noString:
+                return None
+            if index >= stringCount:
+                raise ParserError('String index %d is out of range' % index)
+            return strings[index]
+
+        meta = {}
+        for k, v in self.pair.iter_unpack(buffer[offset:offset + metaCount * self.pair.size]):
+            meta[string(k)] = string(v)
+        offset += metaCount * self.pair.size
+
+        nodeRecords = buffer[offset:offset + nodeCount * self.node.size]
+        offset += nodeCount * self.node.size
+        attributeRecords = list(self.pair.iter_unpack(buffer[offset:offset + attributeCount * self.pair.size]))
+        offset += attributeCount * self.pair.size
+
+        nodes = []
+        for kind, id, title, description, attributeStart, attributes in self.node.iter_unpack(nodeRecords):
+            if kind == self.kindConjunction:
+                nodes.append(Conjunction(string(id), string(title)))
+                continue
+            if kind == self.kindThreat:
+                n = Threat()
+            elif kind == self.kindCountermeasure:
+                n = Countermeasure()
+            else:
+                raise ParserError('Unknown node kind %d' % kind)
+            n.id = string(id)
+            n.title = string(title)
+            n.description = string(description)
+            for k, v in attributeRecords[attributeStart:attributeStart + attributes]:
+                n.attributes[string(k)] = string(v)
+            nodes.append(n)
+
+        sources = struct.unpack_from('<%dI' % edgeCount, buffer, offset)
+        destinations = struct.unpack_from('<%dI' % edgeCount, buffer, offset + 4 * edgeCount)
+        if root < -1:
+            raise ParserError('Root index %d is out of range' % root)
+        try:
+            edges = [(nodes[s].id, nodes[d].id) for s, d in zip(sources, destinations)]
+            root = nodes[root].id if root >= 0 else None
+        except IndexError:
+            raise ParserError('Node index is out of range')
+        return flags & self.flagExtended == self.flagExtended, meta, nodes, edges, root
+
+    @staticmethod
+    def sniffFile(file):
+        """
+        Checks if a file is a binary snapshot
+
+        :param file: File to check
+        :return: True if the file starts with the magic bytes
+        """
+        try:
+            with open(file, 'rb') as fp:
+                return fp.read(len(Handler.magic)) == Handler.magic
+        except OSError:
+            return False
@@ -1,7 +1,11 @@
+import functools
+import hashlib
 import os
+import threading
+
 from lxml import etree
 
-from data.exceptions import XMLXSDError
+from data.exceptions import XMLXSDError, ParserError
 from data.types import Countermeasure, Conjunction, Threat
 
 
@@ -10,56 +14,221 @@ class Handler:
     This class Handles all needed actions to save and load xml files
     """
 
+    """
+    Sections of the extended format which contain nodes or connections
+    """
+    extendedSections = ('threats', 'countermeasures', 'conjunctions', 'connections')
+
+    """
+    Number of elements which are serialized at once by writeExtendedTree
+    """
+    writeChunkSize = 1024
+
+    """
+    Compiled xsd files, shared by all instances of Handler
+    """
+    schemas = {}
+    schemaLock = threading.Lock()
+
     def __init__(self):
         """
         Constructor for Handler
 
-        The Constructor initialises the xml parser and xsd files
+        The Constructor initialises the xml parser.
+        The xsd files are compiled on first use and shared between all handlers
         """
         self.parser = etree.XMLParser(dtd_validation=True)
         self.xml = None
         self.extended = False
 
-        includePath = os.path.dirname(os.path.abspath(__file__))
+    @staticmethod
+    def getSchema(name):
+        """
+        Returns the compiled xsd file from the assets.
+        The file is compiled only once per process
 
-        try:
-            self.simpleXSD = etree.XMLSchema(etree.parse(os.path.join(includePath, 'assets/attackTreeSimple.xsd')))
-        except OSError:
-            raise XMLXSDError('Can\'t load attackTreeSimple.xsd, check installation')
-        try:
-            self.extendedXSD = etree.XMLSchema(etree.parse(os.path.join(includePath, 'assets/attackTreeExtended.xsd')))
-        except OSError:
-            raise XMLXSDError('Can\'t load attackTreeExtended.xsd, check installation')
+        :param name: File name of the xsd file
+        :return: Compiled xsd file
+        :raises XMLXSDError: if the xsd file can't be loaded
+        """
+        schema = Handler.schemas.get(name)
+        if schema is None:
+            with Handler.schemaLock:
+                schema = Handler.schemas.get(name)
+                if schema is None:
+                    includePath = os.path.dirname(os.path.abspath(__file__))
+                    try:
+                        schema = etree.XMLSchema(etree.parse(os.path.join(includePath, 'assets', name)))
+                    except OSError:
+                        raise XMLXSDError('Can\'t load %s, check installation' % name)
+                    Handler.schemas[name] = schema
+        return schema
+
+    @property
+    def simpleXSD(self):
+        """
+        :return: Compiled xsd file for the simple format
+        """
+        return Handler.getSchema('attackTreeSimple.xsd')
 
-    def loadFile(self, file):
+    @property
+    def extendedXSD(self):
+        """
+        :return: Compiled xsd file for the extended format
+        """
+        return Handler.getSchema('attackTreeExtended.xsd')
+
+    def loadFile(self, file, checksum=None):
         """
         Loads a given file and validates it against the xsd files
 
+        If a checksum is given and the file matches it, the file is trusted and the xsd validation is skipped
+
         :param file: a file to load from
+        :param checksum: sha256 checksum of a file which was generated and verified before
         :return: True if file is valid, else False
         """
+        trusted = False
         try:
-            self.xml = etree.parse(file)
-        except OSError:
+            if checksum is not None:
+                data = Handler.readFile(file)
+                trusted = hashlib.sha256(data).hexdigest() == checksum
+                self.xml = etree.ElementTree(etree.fromstring(data))
+            else:
+                self.xml = etree.parse(file)
+        except (OSError, etree.XMLSyntaxError):
             return False
-        finally:
-            return self.validate()
+        if trusted is True:
+            extended = self.sniff()
+            if extended is None:
+                return False
+            self.extended = extended
+            return True
+        return self.validate()
+
+    @staticmethod
+    def readFile(file):
+        """
+        Reads the content of a file
+
+        :param file: file name or file object
+        :return: Content of the file as bytes
+        """
+        if hasattr(file, 'read'):
+            return file.read()
+        with open(file, 'rb') as fp:
+            return fp.read()
+
+    @staticmethod
+    def checksum(file):
+        """
+        Calculates the checksum of a file for loadFile.
+        The file is read in blocks, file objects are rewound afterwards
+
+        :param file: file name or file object
+        :return: sha256 checksum as hex string
+        """
+        checksum = hashlib.sha256()
+        if hasattr(file, 'read'):
+            for block in iter(functools.partial(file.read, 2 ** 20), b''):
+                checksum.update(block)
+            file.seek(0)
+        else:
+            with open(file, 'rb') as fp:
+                for block in iter(functools.partial(fp.read, 2 ** 20), b''):
+                    checksum.update(block)
+        return checksum.hexdigest()
+
+    def sniffFile(self, file):
+        """
+        Finds the format of a file by reading only its beginning, see sniff.
+        Sets self.extended
+
+        :param file: file name or file object
+        :return: True for the extended format, False for the simple format, None if the format is unknown
+        """
+        extended = None
+        depth = 0
+        try:
+            for event, element in etree.iterparse(file, events=('start', 'end')):
+                if event == 'end':
+                    depth -= 1
+                    continue
+                if depth == 1 and element.tag == 'tree':
+                    extended = False
+                    break
+                if depth == 1 and element.tag == 'threats':
+                    extended = True
+                    break
+                depth += 1
+        except (OSError, etree.XMLSyntaxError):
+            extended = None
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        if extended is not None:
+            self.extended = extended
+        return extended
+
+    def iterExtended(self, file, validate=True):
+        """
+        Streams the elements of a file in the extended format.
+        Yields tuples (section, element) where section is 'meta', 'threats', 'countermeasures', 'conjunctions'
+        or 'connections'. Every element is cleared after it was handled,
+        so only the current element is held in memory
+
+        :param file: file name or file object
+        :param validate: validates the file against the xsd file while reading it
+        :raises ParserError: if the file can't be read or is not valid
+        """
+        schema = self.extendedXSD if validate is True else None
+        try:
+            for event, element in etree.iterparse(file, events=('end',), schema=schema):
+                parent = element.getparent()
+                if parent is None:
+                    continue
+                if parent.getparent() is None:
+                    if element.tag == 'meta':
+                        yield 'meta', element
+                    element.clear()
+                elif parent.getparent().getparent() is None and parent.tag in self.extendedSections:
+                    yield parent.tag, element
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del parent[0]
+        except (OSError, etree.XMLSyntaxError) as e:
+            raise ParserError('Can\'t load %s: %s' % (file, e))
+
+    def sniff(self):
+        """
+        Checks the structure below the root element to find the format of the xml-file.
+        The simple format contains a 'tree' element, the extended format a 'threats' element
+
+        :return: True for the extended format, False for the simple format, None if the format is unknown
+        """
+        if self.xml is None:
+            return None
+        root = self.xml.getroot()
+        if root.find('tree') is not None:
+            return False
+        if root.find('threats') is not None:
+            return True
+        return None
 
     def validate(self):
         """
         Checks if the given xml-file is in simple or extended format
+        The format is detected with sniff and the file is only validated against this format.
         If the format is extended self.extended is True
 
         :return: True if validation was successful else false
         """
-        if self.validateSimple():
-            self.extended = False
-            return True
-        elif self.validateExtended():
-            self.extended = True
-            return True
-        else:
+        extended = self.sniff()
+        if extended is None:
             return False
+        self.extended = extended
+        if extended is True:
+            return self.validateExtended()
+        return self.validateSimple()
 
     def validateSimple(self):
         """
@@ -162,13 +331,24 @@ class Handler:
         :param element: Element to insert
         :return: Generated XML Element
         """
+        e = self.createNode(element)
+        root.append(e)
+        return e
+
+    def createNode(self, element):
+        """
+        Generates a node without a parent element
+
+        :param element: Element to generate
+        :return: Generated XML Element
+        """
         if isinstance(element, Conjunction):
             if self.extended is True:
-                e = etree.SubElement(root, 'conjunction', type=element.conjunctionType, id=element.id)
+                e = etree.Element('conjunction', type=element.conjunctionType, id=element.id)
             else:
-                e = etree.SubElement(root, element.conjunctionType, id=element.id)
+                e = etree.Element(element.conjunctionType, id=element.id)
         else:
-            e = etree.SubElement(root, type(element).__name__.lower(), id=element.id)
+            e = etree.Element(type(element).__name__.lower(), id=element.id)
             title = etree.SubElement(e, 'title')
             title.text = element.title
 
@@ -246,6 +426,101 @@ class Handler:
         for edge in tree.edgeList:
             etree.SubElement(xmlConnection, 'connection', source=edge.source, destination=edge.destination)
 
+    def saveTree(self, tree, file):
+        """
+        Saves a tree to a file.
+        Trees in the extended format are written with writeExtendedTree without building the xml in memory
+
+        :param tree: Tree to save
+        :param file: File to save to
+        :return: True if saving was successfully else returns exception
+        """
+        if tree.extended is False and tree.checkExtended() is not True:
+            self.generateSimpleTree(tree)
+            return self.saveToFile(file)
+        return self.writeExtendedTree(tree, file)
+
+    def writeExtendedTree(self, tree, file):
+        """
+        Writes the tree in the extended format directly to a file.
+        Only the frame with the meta information is generated as xml tree,
+        the nodes and connections are serialized one by one.
+        The output is the same as generateExtendedTree followed by saveToFile
+
+        :param tree: Tree to save
+        :param file: File to save to
+        :return: True if saving was successfully else returns exception
+        """
+        self.generateTemplate(True)
+        tree.meta['root'] = tree.root
+        self.generateMetaElements(tree.meta)
+        frame = etree.tostring(self.xml, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+        frame = frame[:frame.rindex(b'  <threats/>\n')]
+
+        sections = (
+            ('threats', (self.createNode(v) for v in tree.nodeList.values()
+                         if isinstance(v, Threat) and not isinstance(v, Countermeasure))),
+            ('countermeasures', (self.createNode(v) for v in tree.nodeList.values() if isinstance(v, Countermeasure))),
+            ('conjunctions', (self.createNode(v) for v in tree.nodeList.values()
+                              if not isinstance(v, Countermeasure) and not isinstance(v, Threat))),
+            ('connections', (etree.Element('connection', source=edge.source, destination=edge.destination)
+                             for edge in tree.edges.values())),
+        )
+        try:
+            fp = file if hasattr(file, 'write') else open(file, 'wb')
+            try:
+                fp.write(frame)
+                for name, elements in sections:
+                    empty = True
+                    for chunk in self.chunks(elements, self.writeChunkSize):
+                        if empty is True:
+                            fp.write(b'  <%s>\n' % name.encode())
+                            empty = False
+                        fp.write(self.serializeChunk(chunk))
+                    if empty is True:
+                        fp.write(b'  <%s/>\n' % name.encode())
+                    else:
+                        fp.write(b'  </%s>\n' % name.encode())
+                fp.write(b'</attackTree>\n')
+            finally:
+                if fp is not file:
+                    fp.close()
+        except Exception as e:
+            return e
+        return True
+
+    @staticmethod
+    def chunks(iterable, size):
+        """
+        Splits an iterable into lists of a fixed size
+
+        :param iterable: Iterable to split
+        :param size: Maximal size of a list
+        :return: Generator of the lists
+        """
+        chunk = []
+        for i in iterable:
+            chunk.append(i)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def serializeChunk(elements):
+        """
+        Serializes elements with the indentation they have inside a section of the tree.
+        The elements are pretty printed inside two wrapper elements which are cut off afterwards
+
+        :param elements: List of elements to serialize
+        :return: Serialized elements as bytes
+        """
+        wrapper = etree.Element('w')
+        etree.SubElement(wrapper, 's').extend(elements)
+        data = etree.tostring(wrapper, pretty_print=True, xml_declaration=False, encoding='UTF-8')
+        return data[len(b'<w>\n  <s>\n'):-len(b'  </s>\n</w>\n')]
+
     def saveToFile(self, file):
         """
         Saves the xml to a file
@@ -3,7 +3,7 @@ import pathlib
 
 import os
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont, QColor
+from PyQt5.QtGui import QFont, QColor, QPixmapCache, QBrush, QPen, QFontMetricsF
 
 
 class Configuration:
@@ -55,6 +55,36 @@ class Configuration:
     }
     font = None
 
+    """
+    Brushes and pens for the colors and the metrics of the font, shared by all nodes, see getStyle and getFontMetrics
+    """
+    styles = {}
+    fontMetrics = None
+
+    """
+    Layout of the tree: 'auto' uses the layered layout for extended trees, 'tree' or 'layered' use always one of them
+    """
+    layout = 'auto'
+
+    """
+    Saves the positions calculated by the layout, so a tree which was drawn before is not laid out again
+    """
+    layoutCache = True
+
+    """
+    Size of the cache for the painted nodes in KB (QPixmapCache), with 0 the nodes are painted again at every repaint
+    """
+    nodeCache = 20480
+
+    """
+    Levels of detail (scale of the view) for zoomed out views.
+    Below titleDetail nodes show only their title, below boxDetail they are painted as boxes without text
+    and below arrowDetail edges are painted without arrowheads
+    """
+    titleDetail = 0.6
+    boxDetail = 0.35
+    arrowDetail = 0.35
+
     @staticmethod
     def checkConfigFile():
         """
@@ -77,6 +107,62 @@ class Configuration:
         Configuration.colors.update(data['colors'])
         Configuration.font = QFont()
         Configuration.font.fromString(data['font'])
+        Configuration.resetStyles()
+        Configuration.layout = data.get('layout', 'auto')
+        Configuration.layoutCache = data.get('layoutCache', True)
+        Configuration.nodeCache = data.get('nodeCache', 20480)
+        Configuration.setNodeCacheLimit()
+
+    @staticmethod
+    def getStyle(parentType, childType):
+        """
+        Returns the brush and the pens for the colors of a node type.
+        They are built once from the colors and shared by all nodes of the type until the colors change
+
+        :param parentType: Parent type for the color (threat, countermeasure, default)
+        :param childType: Conjunction type or node
+        :return: Dictionary with the brush for the background and the pens for the border and the font
+        """
+        style = Configuration.styles.get((parentType, childType))
+        if style is None:
+            colors = Configuration.colors[parentType][childType]
+            style = {'background': QBrush(QColor(colors['background'])), 'border': QPen(QColor(colors['border']), 2),
+                     'font': QPen(QColor(colors['font']))}
+            Configuration.styles[(parentType, childType)] = style
+        return style
+
+    @staticmethod
+    def getFontMetrics():
+        """
+        :return: QFontMetricsF of the font, shared by all nodes until the font changes
+        """
+        if Configuration.fontMetrics is None:
+            Configuration.fontMetrics = QFontMetricsF(Configuration.font)
+        return Configuration.fontMetrics
+
+    @staticmethod
+    def resetStyles():
+        """
+        Removes the brushes, pens and font metrics, they are built again from the colors and the font.
+        Has to be called if the colors or the font change
+        """
+        Configuration.styles = {}
+        Configuration.fontMetrics = None
+
+    @staticmethod
+    def setNodeCacheLimit():
+        """
+        Sets the size of the cache for the painted nodes
+        """
+        if Configuration.nodeCache > 0:
+            QPixmapCache.setCacheLimit(Configuration.nodeCache)
+
+    @staticmethod
+    def getLayoutCacheDirectory():
+        """
+        :return: Directory for the positions saved by the layout cache in $HOME/.attackTreeDraw
+        """
+        return os.path.join(pathlib.Path.home(), '.attackTreeDraw/layouts')
 
     @staticmethod
     def saveConfig():
@@ -84,6 +170,7 @@ class Configuration:
         Saves the configuration to the config file at $HOME/.attackTreeDraw
         """
         pathlib.Path(os.path.join(pathlib.Path.home(), '.attackTreeDraw')).mkdir(parents=True, exist_ok=True)
-        data = {'colors': Configuration.colors, 'font': Configuration.font.toString()}
+        data = {'colors': Configuration.colors, 'font': Configuration.font.toString(), 'layout': Configuration.layout,
+                'layoutCache': Configuration.layoutCache, 'nodeCache': Configuration.nodeCache}
         with open(os.path.join(pathlib.Path.home(), '.attackTreeDraw/config.json'), 'w') as fp:
             json.dump(data, fp)
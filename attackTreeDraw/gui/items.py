@@ -2,11 +2,11 @@ import functools
 import math
 import traceback
 
-from PyQt5.QtCore import Qt, QRectF, QSizeF, QLineF, QPointF, QRect, QPoint
+from PyQt5.QtCore import Qt, QRectF, QLineF, QPointF, QPoint
 
-from PyQt5.QtGui import QBrush, QFont, QPen, QPolygonF, QTransform, QPainter, QColor
-from PyQt5.QtWidgets import QGraphicsItemGroup, QGraphicsItem, QGraphicsTextItem, QGraphicsRectItem, QGraphicsLineItem, \
-    QStyleOptionGraphicsItem, QStyle, QGraphicsScene, QMenu, QGraphicsView, QMessageBox
+from PyQt5.QtGui import QFont, QPen, QPolygonF, QTransform, QPainter, QStaticText, QTextOption
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsLineItem, QStyle, QGraphicsScene, QMenu, \
+    QGraphicsView, QMessageBox
 
 from .windows import NodeEdit, MessageBox, ConjunctionEdit
 
@@ -14,13 +14,20 @@ from data import types
 from .helper import Configuration
 
 
-class Node(QGraphicsItemGroup):
+class Node(QGraphicsItem):
     """
     Parent class for all types of nodes.
 
-    It contains all necessary functions to print a node in the GUI
+    It contains all necessary functions to print a node in the GUI.
+    A node is a single item, which paints the rectangles and the texts of the header, the attributes and the footer
+    itself. The texts are laid out once when the node is printed and painted from the cached layouts
     """
 
+    """
+    Space between the border of a rectangle and its text
+    """
+    textMargin = 4
+
     def __init__(self, node, parent, background, border, text, x=0, y=0, offset=20):
         """
         Constructor for the node class.
@@ -28,9 +35,9 @@ class Node(QGraphicsItemGroup):
 
         :param node: data node which it gets the data from
         :param parent: parent widget
-        :param background: background color of the node
-        :param border: border color for the node
-        :param text: text color for the node
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
         :param x: x-position of the node
         :param y: y-position of the node
         :param offset: offset for the type to center it
@@ -50,24 +57,38 @@ class Node(QGraphicsItemGroup):
         self.childEdges = []
         self.parentEdges = []
 
-        self.headerGroup = QGraphicsItemGroup()
-        self.attributes = QGraphicsItemGroup()
-        self.footerGroup = QGraphicsItemGroup()
+        """
+        Rectangles of the node and the texts in them as tuple (position, QStaticText).
+        box is the rectangle around the rectangles, rect is the rectangle around everything the node paints
+        """
+        self.rects = []
+        self.texts = []
+        self.titleText = None
+        self.box = QRectF()
+        self.rect = QRectF()
 
         self.setFlag(QGraphicsItem.ItemIsMovable, True)
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
+        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges, True)
 
         self.attributesHeight = 0
         self.headerHeight = 0
 
-        self.printHeader(background, border, text)
-        self.printAttributes(background, border, text)
-        self.printFooter(background, border, text)
+        self.redrawOptions(background, border, text)
 
         self.setAcceptDrops(True)
 
         self.setPos(x, y)
 
+    def getState(self):
+        """
+        Returns everything of the data node which is printed, so changes of the tree can be found without redrawing
+
+        :return: Tuple with the printed values
+        """
+        return type(self.node), self.node.id, self.node.title, self.node.description, \
+            tuple(self.node.attributes.items())
+
     def getTypeRecursiveDown(self):
         """
         Searches the children of a node to get a node with type != Conjunction
@@ -121,11 +142,14 @@ class Node(QGraphicsItemGroup):
         """
         for e in self.childEdges:
             if isinstance(self, Threat) and e.dst.getTypeRecursiveDown() is Threat:
-                e.offset = -50
+                offset = -50
             elif isinstance(self, Threat) and e.dst.getTypeRecursiveDown() is Countermeasure:
-                e.offset = 50
+                offset = 50
             else:
-                e.offset = 0
+                offset = 0
+            if e.offset != offset:
+                e.offset = offset
+                e.updatePosition()
 
     def fixParentEdgeRec(self):
         """
@@ -159,153 +183,100 @@ class Node(QGraphicsItemGroup):
                     neutralLeft = False
         return left, right
 
-    def printHeader(self, background, border, text):
+    def addText(self, text, x, y, width=None):
         """
-        Prints the the header of the node.
-        It contains the Node id, title and type
+        Lays out a text and adds it to the texts of the node.
+        The text is placed and wrapped like in a QGraphicsTextItem at the same position
 
-        :param background: background color of the node
-        :param border: border color for the node
-        :param text: text color for the node
+        :param text: text to add
+        :param x: x-position of the rectangle of the text
+        :param y: y-position of the rectangle of the text
+        :param width: width to wrap the text at, None if the text is not wrapped
+        :return: height of the text like the height of a QGraphicsTextItem
         """
-        x = self.x()
-        y = self.y()
-
-        self.idText = QGraphicsTextItem()
-        self.typeText = QGraphicsTextItem()
-        self.titleText = QGraphicsTextItem()
-
-        self.idRect = QGraphicsRectItem()
-        self.typeRect = QGraphicsRectItem()
-        self.titleRect = QGraphicsRectItem()
-
-        self.typeText.setFont(Configuration.font)
-        self.titleText.setFont(Configuration.font)
-        self.idText.setFont(Configuration.font)
-
-        self.typeText.setDefaultTextColor(QColor(text))
-        self.titleText.setDefaultTextColor(QColor(text))
-        self.idText.setDefaultTextColor(QColor(text))
-
-        self.titleText.setTextWidth(200)
-
-        self.idText.setPlainText(self.node.id)
-        self.typeText.setPlainText(type(self.node).__name__)
-        self.titleText.setPlainText(self.node.title)
-
-        titleHeight = int(self.titleText.boundingRect().height() / 20 + 0.5) * 20
+        text = text or ''
+        staticText = QStaticText(text.replace('\n', '\u2028'))
+        staticText.setTextFormat(Qt.PlainText)
+        if width is not None:
+            option = QTextOption()
+            option.setWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
+            staticText.setTextOption(option)
+            staticText.setTextWidth(width - 2 * self.textMargin)
+        staticText.prepare(QTransform(), self.font)
+        self.texts.append((QPointF(x + self.textMargin, y + self.textMargin), staticText))
 
-        self.idRect.setRect(x, y, 50, 20)
-        self.typeRect.setRect(x + 50, y, 150, 20)
-        self.titleRect.setRect(x, y + 20, 200, titleHeight)
+        """
+        Paragraphs are a bit further apart than the lines of a paragraph
+        """
+        metrics = Configuration.getFontMetrics()
+        return max(staticText.size().height(), metrics.height()) + 2 * self.textMargin + \
+            text.count('\n') * (metrics.height() - metrics.lineSpacing())
 
-        self.idRect.setBrush(QBrush(QColor(background)))
-        self.typeRect.setBrush(QBrush(QColor(background)))
-        self.titleRect.setBrush(QBrush(QColor(background)))
+    def printHeader(self, background, border, text):
+        """
+        Prints the the header of the node.
+        It contains the Node id, title and type
 
-        self.idRect.setPen(QPen(QColor(border), 2))
-        self.typeRect.setPen(QPen(QColor(border), 2))
-        self.titleRect.setPen(QPen(QColor(border), 2))
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
+        """
+        self.addText(self.node.id, 0, -2)
+        self.addText(type(self.node).__name__, self.typeOffset, -2)
+        titleHeight = int(self.addText(self.node.title, 0, 18, 200) / 20 + 0.5) * 20
+        self.titleText = self.texts[-1]
 
-        self.idText.setPos(x, y - 2)
-        self.typeText.setPos(x + self.typeOffset, y - 2)
-        self.titleText.setPos(x, y + 18)
+        self.rects.append(QRectF(0, 0, 50, 20))
+        self.rects.append(QRectF(50, 0, 150, 20))
+        self.rects.append(QRectF(0, 20, 200, titleHeight))
 
         self.headerHeight = titleHeight + 20
 
         self.setToolTip(self.node.description)
 
-        self.headerGroup.addToGroup(self.idRect)
-        self.headerGroup.addToGroup(self.typeRect)
-        self.headerGroup.addToGroup(self.titleRect)
-        self.headerGroup.addToGroup(self.idText)
-        self.headerGroup.addToGroup(self.typeText)
-        self.headerGroup.addToGroup(self.titleText)
-        self.addToGroup(self.headerGroup)
-
     def printAttributes(self, background, border, text):
         """
         Prints the attributes of the node
         The attributes are a key, value pair
 
-        :param background: background color of the node
-        :param border: border color for the node
-        :param text: text color for the node
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
         """
-        y = self.y() + self.headerHeight
-        x = self.x()
+        y = self.headerHeight
 
         self.attributesHeight = 0
 
         for k, v in self.node.attributes.items():
-            key = QGraphicsTextItem()
-            key.setFont(Configuration.font)
-            key.setDefaultTextColor(QColor(text))
-            key.setTextWidth(100)
-            key.setPlainText(k)
-            keyHeight = int(key.boundingRect().height() / 20 + 0.5) * 20
-
-            value = QGraphicsTextItem()
-            value.setFont(Configuration.font)
-            value.setDefaultTextColor(QColor(text))
-            value.setTextWidth(100)
-            value.setPlainText(v)
-            valueHeight = int(value.boundingRect().height() / 20 + 0.5) * 20
+            keyHeight = int(self.addText(k, 0, y - 2, 100) / 20 + 0.5) * 20
+            valueHeight = int(self.addText(v, 100, y - 2, 100) / 20 + 0.5) * 20
 
             height = valueHeight if valueHeight > keyHeight else keyHeight
 
-            keyRect = QGraphicsRectItem()
-            keyRect.setRect(x, y, 100, height)
-            valueRect = QGraphicsRectItem()
-            valueRect.setRect(x + 100, y, 100, height)
-
-            keyRect.setBrush(QBrush(QColor(background)))
-            valueRect.setBrush(QBrush(QColor(background)))
-
-            keyRect.setPen(QPen(QColor(border), 2))
-            valueRect.setPen(QPen(QColor(border), 2))
-
-            key.setPos(x, y - 2)
-            value.setPos(x + 100, y - 2)
-
-            self.attributes.addToGroup(keyRect)
-            self.attributes.addToGroup(valueRect)
-            self.attributes.addToGroup(key)
-            self.attributes.addToGroup(value)
+            self.rects.append(QRectF(0, y, 100, height))
+            self.rects.append(QRectF(100, y, 100, height))
 
             y = y + height
             self.attributesHeight += height
 
-        self.addToGroup(self.attributes)
-
     def redrawOptions(self, background, border, text):
         """
         Redraws the node with option for the background, border and text color
 
-        :param background: background color of the node
-        :param border: border color for the node
-        :param text: text color for the node
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
         """
-        y = self.y()
-        x = self.x()
-
         self.prepareGeometryChange()
 
-        for i in self.attributes.childItems():
-            self.attributes.removeFromGroup(i)
-            self.parent.scene.removeItem(i)
-
-        for i in self.headerGroup.childItems():
-            self.headerGroup.removeFromGroup(i)
-            self.parent.scene.removeItem(i)
-
-        for i in self.footerGroup.childItems():
-            self.footerGroup.removeFromGroup(i)
-            self.parent.scene.removeItem(i)
+        self.rects = []
+        self.texts = []
+        self.rect = QRectF()
 
-        self.removeFromGroup(self.attributes)
-        self.removeFromGroup(self.footerGroup)
-        self.removeFromGroup(self.headerGroup)
+        self.backgroundBrush = background
+        self.borderPen = border
+        self.textPen = text
+        self.font = Configuration.font
 
         self.printHeader(background, border, text)
 
@@ -313,25 +284,39 @@ class Node(QGraphicsItemGroup):
 
         self.printFooter(background, border, text)
 
-        self.parent.scene.removeItem(self)
-        self.parent.scene.addItem(self)
+        self.box = QRectF()
+        for r in self.rects:
+            self.box = self.box.united(r)
+        self.rect = self.rect.united(self.box)
 
-        self.setPos(x, y)
+        """
+        The node is painted to a pixmap in device coordinates and repainted from it, until the pixmap is invalidated
+        by update or the zoom of the view changes
+        """
+        if Configuration.nodeCache > 0:
+            self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        else:
+            self.setCacheMode(QGraphicsItem.NoCache)
+        self.update()
+        self.updateEdges()
+
+        self.printedState = self.getState()
 
     def redraw(self):
         """
-        Redraws the node with standard colors
+        Redraws the node with the default colors
         """
-        self.redrawOptions(Qt.white, Qt.black, Qt.black)
+        style = Configuration.getStyle('default', 'node')
+        self.redrawOptions(style['background'], style['border'], style['font'])
 
     def printFooter(self, background, border, text):
         """
         Prototype function for the footer.
         Implemented in the child classes
 
-        :param background: background color of the node
-        :param border: border color for the node
-        :param text: text color for the node
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
         """
         pass
 
@@ -345,26 +330,78 @@ class Node(QGraphicsItemGroup):
         self.node.position = (x, y)
         super().setPos(x, y)
 
+    def updateEdges(self):
+        """
+        Updates the arrows from and to this node, e.g. after the node was moved or got another size
+        """
+        for e in self.childEdges:
+            e.updatePosition()
+        for e in self.parentEdges:
+            e.updatePosition()
+
+    def itemChange(self, change, value):
+        """
+        Reimplementation of the notification for changes of the item.
+        The arrows from and to the node are updated when the node was moved
+
+        :param change: what was changed
+        :param value: new value
+        :return: value of QGraphicsItem.itemChange
+        """
+        if change == QGraphicsItem.ItemPositionHasChanged:
+            self.updateEdges()
+        return super().itemChange(change, value)
+
+    def boundingRect(self):
+        """
+        Bounding rectangle of the rectangles of the node with their border and the border of the selection
+
+        :return: bounding rectangle
+        """
+        return self.rect.adjusted(-2.5, -2.5, 2.5, 2.5)
+
     def paint(self, painter, options, widget=None):
         """
-        Reimplementation for the paint function of the QGraphicsItemGroup.
-        The Reimplementation is needed to print a proper border when the item is selected
+        Paints the rectangles and the texts of the node and a border when the item is selected.
+        If the view is zoomed out the node is painted with less detail (see Configuration.titleDetail and boxDetail):
+        only the box with the title or only the box
 
         :param painter: The painter, which draws the node
         :param options: options for the paint job
         :param widget: widget of the Item
         """
-        myOption = QStyleOptionGraphicsItem(options)
-        myOption.state &= ~QStyle.State_Selected
+        detail = options.levelOfDetailFromTransform(painter.worldTransform())
+
+        painter.setPen(self.borderPen)
+        painter.setBrush(self.backgroundBrush)
+        if detail < Configuration.titleDetail:
+            painter.drawRect(self.box)
+            if detail >= Configuration.boxDetail:
+                painter.setPen(self.textPen)
+                painter.setFont(self.font)
+                painter.drawStaticText(*self.titleText)
+        else:
+            for r in self.rects:
+                painter.drawRect(r)
+
+            painter.setPen(self.textPen)
+            painter.setFont(self.font)
+            for position, staticText in self.texts:
+                painter.drawStaticText(position, staticText)
 
-        super().paint(painter, myOption, widget=None)
+        self.paintSelection(painter, options)
 
+    def paintSelection(self, painter, options):
+        """
+        Paints a dotted border around the node when the item is selected
+
+        :param painter: The painter, which draws the node
+        :param options: options for the paint job
+        """
         if options.state & QStyle.State_Selected:
             painter.setPen(QPen(Qt.black, 2, Qt.DotLine))
-            rect = QRect(self.boundingRect().x() - 1.5, self.boundingRect().y() - 1.5,
-                         self.boundingRect().x() + self.boundingRect().width() + 3,
-                         self.boundingRect().y() + self.boundingRect().height() + 0.5)
-            painter.drawRect(rect)
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self.rect.adjusted(-1.5, -1.5, 1.5, 1.5))
 
     def selectChildren(self):
         """
@@ -381,10 +418,15 @@ class Node(QGraphicsItemGroup):
         """
         for e in self.parentEdges:
             self.parent.scene.removeItem(e)
+            e.start.childEdges.remove(e)
         for e in self.childEdges:
             self.parent.scene.removeItem(e)
+            e.dst.parentEdges.remove(e)
         self.parent.tree.removeNode(self.node.id)
         self.parent.scene.removeItem(self)
+        for e in self.parentEdges:
+            if isinstance(e.start, Conjunction):
+                e.start.redraw()
 
     def edit(self):
         """
@@ -429,68 +471,32 @@ class Threat(Node):
         :param x: x-position of the node
         :param y: y-position of the node
         """
-        self.threatBox = None
-        self.counterBox = None
-
-        self.threatBoxText = None
-        self.counterBoxText = None
-
-        super().__init__(node, parent, Configuration.colors['threat']['node']['background'],
-                         Configuration.colors['threat']['node']['border'],
-                         Configuration.colors['threat']['node']['font'], x, y, 91)
+        style = Configuration.getStyle('threat', 'node')
+        super().__init__(node, parent, style['background'], style['border'], style['font'], x, y, 91)
 
     def printFooter(self, background, border, text):
         """
         Prints the footer for the threat node
         The footer contains two columns where the conjunction will start from
 
-        :param background: background color of the node
-        :param border: border color for the node
-        :param text: text color for the node
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
         """
-        self.threatBoxText = QGraphicsTextItem()
-        self.threatBoxText.setFont(Configuration.font)
-        self.threatBoxText.setDefaultTextColor(QColor(text))
-        self.threatBoxText.setPlainText('T')
-
-        self.counterBoxText = QGraphicsTextItem()
-        self.counterBoxText.setFont(Configuration.font)
-        self.counterBoxText.setDefaultTextColor(QColor(text))
-        self.counterBoxText.setPlainText('C')
-
-        self.threatBox = QGraphicsRectItem()
-        self.counterBox = QGraphicsRectItem()
-
-        self.threatBox.setBrush(QBrush(QColor(background)))
-        self.counterBox.setBrush(QBrush(QColor(background)))
-
-        self.threatBox.setPen(QPen(QColor(border), 2))
-        self.counterBox.setPen(QPen(QColor(border), 2))
-
-        self.footerGroup = QGraphicsItemGroup()
-
-        self.footerGroup.addToGroup(self.threatBox)
-        self.footerGroup.addToGroup(self.counterBox)
-        self.footerGroup.addToGroup(self.threatBoxText)
-        self.footerGroup.addToGroup(self.counterBoxText)
+        y = self.headerHeight + self.attributesHeight
 
-        self.threatBox.setRect(0, 0, 100, 20)
-        self.counterBox.setRect(100, 0, 100, 20)
+        self.rects.append(QRectF(0, y, 100, 20))
+        self.rects.append(QRectF(100, y, 100, 20))
 
-        self.threatBoxText.setPos(40, 0)
-        self.counterBoxText.setPos(140, 0)
-
-        self.footerGroup.setPos(self.x(), self.y() + self.headerHeight + self.attributesHeight)
-
-        self.addToGroup(self.footerGroup)
+        self.addText('T', 40, y)
+        self.addText('C', 140, y)
 
     def redraw(self):
         """
         Redraws the node with the colors set in the options menu
         """
-        super().redrawOptions(Configuration.colors['threat']['node']['background'],
-                              Configuration.colors['threat']['node']['border'],
-                              Configuration.colors['threat']['node']['font'])
+        style = Configuration.getStyle('threat', 'node')
+        super().redrawOptions(style['background'], style['border'], style['font'])
 
 
 class Countermeasure(Node):
@@ -508,17 +514,15 @@ class Countermeasure(Node):
         :param x: x-position of the node
         :param y: y-position of the node
         """
-        super().__init__(node, parent, Configuration.colors['countermeasure']['node']['background'],
-                         Configuration.colors['countermeasure']['node']['border'],
-                         Configuration.colors['countermeasure']['node']['font'], x, y, 63)
+        style = Configuration.getStyle('countermeasure', 'node')
+        super().__init__(node, parent, style['background'], style['border'], style['font'], x, y, 63)
 
     def redraw(self):
         """
         Redraws the node with the colors set in the options menu
         """
-        super().redrawOptions(Configuration.colors['countermeasure']['node']['background'],
-                              Configuration.colors['countermeasure']['node']['border'],
-                              Configuration.colors['countermeasure']['node']['font'])
+        style = Configuration.getStyle('countermeasure', 'node')
+        super().redrawOptions(style['background'], style['border'], style['font'])
 
 
 class Conjunction(Node):
@@ -545,16 +549,32 @@ class Conjunction(Node):
                 parentType = 'default'
         else:
             parentType = 'default'
-        super().__init__(node, parent, Configuration.colors[parentType][node.conjunctionType]['background'],
-                         Configuration.colors[parentType][node.conjunctionType]['border'],
-                         Configuration.colors[parentType][node.conjunctionType]['font'], x, y, 60)
-        self.conjunctionRect = ConjunctionRect()
-        self.conjunctionRect.setPen(QPen(QColor(Configuration.colors[parentType][node.conjunctionType]['border']), 2))
-        self.conjunctionRect.setBrush(
-            QBrush(QColor(Configuration.colors[parentType][node.conjunctionType]['background'])))
-        self.conjunctionRect.setRect(self.x() - 20, self.y() + 1, 240, self.headerHeight - 2)
-        self.conjunctionRect.setZValue(-1)
-        self.addToGroup(self.conjunctionRect)
+        style = Configuration.getStyle(parentType, node.conjunctionType)
+        super().__init__(node, parent, style['background'], style['border'], style['font'], x, y, 60)
+
+    def getState(self):
+        """
+        Returns everything of the data node which is printed.
+        The colors of a conjunction depend on the type of its children
+
+        :return: Tuple with the printed values
+        """
+        if len(self.node.children) > 0 and self.node.children[0] in self.parent.tree.nodeList:
+            childType = self.parent.tree.getTypeRecursiveDown(self.parent.tree.nodeList[self.node.children[0]])
+        else:
+            childType = None
+        return super().getState() + (self.node.conjunctionType, childType)
+
+    def printFooter(self, background, border, text):
+        """
+        Prints the rounded corners around the node, a conjunction has no footer
+
+        :param background: brush for the background of the node
+        :param border: pen for the border of the node
+        :param text: pen for the text of the node
+        """
+        self.conjunctionRect = QRectF(-20, 1, 240, self.headerHeight - 2)
+        self.rect = self.conjunctionRect
 
     def redraw(self):
         """
@@ -571,43 +591,33 @@ class Conjunction(Node):
                 parentType = 'default'
         else:
             parentType = 'default'
-        self.removeFromGroup(self.conjunctionRect)
-        self.parent.scene.removeItem(self.conjunctionRect)
-        super().redrawOptions(Configuration.colors[parentType][self.node.conjunctionType]['background'],
-                              Configuration.colors[parentType][self.node.conjunctionType]['border'],
-                              Configuration.colors[parentType][self.node.conjunctionType]['font'])
-        """
-        Prints the rounded corners around the node
-        """
-        self.conjunctionRect = ConjunctionRect()
-        self.conjunctionRect.setPen(
-            QPen(QColor(Configuration.colors[parentType][self.node.conjunctionType]['border']), 2))
-        self.conjunctionRect.setBrush(
-            QBrush(QColor(Configuration.colors[parentType][self.node.conjunctionType]['background'])))
-        self.conjunctionRect.setRect(self.x() - 20, self.y() + 1, 240, self.headerHeight - 2)
-        self.conjunctionRect.setZValue(-1)
-        self.addToGroup(self.conjunctionRect)
+        style = Configuration.getStyle(parentType, self.node.conjunctionType)
+        super().redrawOptions(style['background'], style['border'], style['font'])
 
     def paint(self, painter, options, widget=None):
         """
-        Reimplementation for the paint function of the QGraphicsItemGroup.
-        The Reimplementation is needed to print a proper border when the item is selected
+        Paints the rounded rectangle behind the node and the node.
+        The rounded rectangle is drawn with antialiasing, if the node is painted as box it is only the rounded rectangle
 
         :param painter: The painter, which draws the node
         :param options: options for the paint job
         :param widget: widget of the Item
         """
-        myOption = QStyleOptionGraphicsItem(options)
-        myOption.state &= ~QStyle.State_Selected
+        if options.levelOfDetailFromTransform(painter.worldTransform()) < Configuration.boxDetail:
+            painter.setPen(self.borderPen)
+            painter.setBrush(self.backgroundBrush)
+            painter.drawRoundedRect(self.conjunctionRect, 20, 20)
+            self.paintSelection(painter, options)
+            return
 
-        if options.state & QStyle.State_Selected:
-            painter.setPen(QPen(Qt.black, 2, Qt.DotLine))
-            rect = QRect(self.boundingRect().x() - 1.5, self.boundingRect().y() - 1.5,
-                         self.boundingRect().x() + self.boundingRect().width() + 23.5,
-                         self.boundingRect().y() + self.boundingRect().height() + 3.5)
-            painter.drawRect(rect)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.borderPen)
+        painter.setBrush(self.backgroundBrush)
+        painter.drawRoundedRect(self.conjunctionRect, 20, 20)
+        painter.restore()
 
-        super().paint(painter, myOption, widget=None)
+        super().paint(painter, options, widget)
 
     def edit(self):
         """
@@ -616,26 +626,6 @@ class Conjunction(Node):
         ConjunctionEdit(self, self.parent).exec()
 
 
-class ConjunctionRect(QGraphicsRectItem):
-    def paint(self, painter, options, widget=None):
-        """
-        Reimplementation for the paint function of the QGraphicsItem.
-        This is needed to draw a rounded rectangle
-        The Reimplementation is also needed to print a proper border when the item is selected
-
-        :param painter: The painter, which draws the node
-        :param options: options for the paint job
-        :param widget: widget of the Item
-        """
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setRenderHint(QPainter.SmoothPixmapTransform)
-
-        painter.setPen(self.pen())
-        painter.setBrush(self.brush())
-
-        painter.drawRoundedRect(self.boundingRect(), 20, 20)
-
-
 class Edge(QGraphicsLineItem):
     """
     Implements an Edge to two nodes
@@ -655,6 +645,8 @@ class Edge(QGraphicsLineItem):
         super().__init__()
 
         self.arrowHead = QPolygonF()
+        self.bounds = QRectF()
+        self.hidden = False
 
         self.start = start
         self.dst = dst
@@ -669,14 +661,12 @@ class Edge(QGraphicsLineItem):
 
     def boundingRect(self):
         """
-        New calculation of the bounding rect, because the arrow is not only a line
+        New calculation of the bounding rect, because the arrow is not only a line.
+        The rectangle is calculated by updatePosition
 
         :return: new bounding rectangle
         """
-        extra = (self.pen().width() + 20) / 2.0
-        return QRectF(self.line().p1(), QSizeF(self.line().p2().x() - self.line().p1().x(),
-                                               self.line().p2().y() - self.line().p1().y())).normalized().adjusted(
-            -extra, -extra, extra, extra)
+        return self.bounds
 
     def shape(self):
         """
@@ -690,68 +680,70 @@ class Edge(QGraphicsLineItem):
 
     def updatePosition(self):
         """
-        Updates the position of the arrow
-        """
-        line = QLineF(self.mapFromItem(self.start, 0, 0), self.mapFromItem(self.dst, 0, 0))
-        self.setLine(line)
-
-    def paint(self, painter, options, widget=None):
-        """
-        Painter implementation for the arrow.
-        First it draws the line and then the triangle on the end
-
-        :param painter: The painter, which draws the node
-        :param options: options for the paint job
-        :param widget: widget of the Item
+        Updates the position of the arrow.
+        It is called when the start or the destination changed, so the arrow is only calculated once and not at
+        every paint. The line starts at the bottom of the start and ends where the line to the top center of
+        the destination enters the destination
         """
+        arrowSize = 10
 
-        if self.start.collidesWithItem(self.dst):
-            return
+        self.prepareGeometryChange()
 
-        myPen = self.pen()
-        arrowSize = 10
-        painter.setPen(myPen)
-        painter.setBrush(myPen.color())
         """
         Calculation for the line
         """
-        centerLine = QLineF(QPointF(self.start.x() + self.start.boundingRect().center().x() + self.offset,
-                                    self.start.y() + self.start.boundingRect().bottom()),
-                            QPointF(self.dst.x() + self.dst.boundingRect().center().x(), self.dst.y()))
-        endPolygon = self.dst.mapFromItem(self.dst, self.dst.boundingRect())
-        p1 = endPolygon.first() + self.dst.pos()
-        p2 = None
+        startPoint = QPointF(self.start.x() + self.start.box.center().x() + self.offset,
+                             self.start.y() + self.start.box.bottom())
+        centerLine = QLineF(startPoint, QPointF(self.dst.x() + self.dst.rect.center().x(), self.dst.y()))
+        endRect = self.dst.rect.translated(self.dst.pos())
+        corners = [endRect.topLeft(), endRect.topRight(), endRect.bottomRight(), endRect.bottomLeft()]
         intersectPoint = QPointF()
 
-        for i in endPolygon:
-            p2 = i + self.dst.pos()
-
-            polyLine = QLineF(p1, p2)
-
-            intersectType = polyLine.intersect(centerLine, intersectPoint)
-            if intersectType == QLineF.BoundedIntersection:
+        for p1, p2 in zip(corners, corners[1:] + corners[:1]):
+            if QLineF(p1, p2).intersect(centerLine, intersectPoint) == QLineF.BoundedIntersection:
                 break
-            p1 = p2
 
-        self.setLine(QLineF(intersectPoint,
-                            QPointF(self.start.x() + self.start.boundingRect().center().x() + self.offset,
-                                    self.start.y() + self.start.boundingRect().bottom())))
+        self.hidden = self.start.collidesWithItem(self.dst)
+
+        line = QLineF(intersectPoint, startPoint)
 
         """
         Calculation for the arrow
         It calculates an left and an right part of the arrow
         """
-        angle = math.atan2(-self.line().dy(), self.line().dx())
-        arrowP1 = self.line().p1() + QPointF(math.sin(angle + math.pi / 3) * arrowSize,
-                                             math.cos(angle + math.pi / 3) * arrowSize)
-        arrowP2 = self.line().p1() + QPointF(math.sin(angle + math.pi - math.pi / 3) * arrowSize,
-                                             math.cos(angle + math.pi - math.pi / 3) * arrowSize)
+        angle = math.atan2(-line.dy(), line.dx())
+        arrowP1 = line.p1() + QPointF(math.sin(angle + math.pi / 3) * arrowSize,
+                                      math.cos(angle + math.pi / 3) * arrowSize)
+        arrowP2 = line.p1() + QPointF(math.sin(angle + math.pi - math.pi / 3) * arrowSize,
+                                      math.cos(angle + math.pi - math.pi / 3) * arrowSize)
+
+        self.arrowHead = QPolygonF([line.p1(), arrowP1, arrowP2])
+
+        extra = (self.pen().width() + 20) / 2.0
+        self.bounds = QRectF(line.p1(), line.p2()).normalized().adjusted(-extra, -extra, extra, extra)
+
+        self.setLine(line)
+
+    def paint(self, painter, options, widget=None):
+        """
+        Painter implementation for the arrow.
+        First it draws the line and then the triangle on the end, the triangle is left out in zoomed out views.
+        The arrow is calculated by updatePosition
 
-        self.arrowHead.clear()
-        self.arrowHead << self.line().p1() << arrowP1 << arrowP2
+        :param painter: The painter, which draws the node
+        :param options: options for the paint job
+        :param widget: widget of the Item
+        """
+        if self.hidden is True:
+            return
+
+        myPen = self.pen()
+        painter.setPen(myPen)
+        painter.setBrush(myPen.color())
 
         painter.drawLine(self.line())
-        painter.drawPolygon(self.arrowHead)
+        if options.levelOfDetailFromTransform(painter.worldTransform()) >= Configuration.arrowDetail:
+            painter.drawPolygon(self.arrowHead)
         if self.isSelected():
             painter.setPen(QPen(Qt.black, 1, Qt.DashLine))
             myLine = self.line()
@@ -787,6 +779,11 @@ class AttackTreeScene(QGraphicsScene):
 
         self.mousePos = (0, 0)
 
+        """
+        All node items in the scene, so they can be found without going through the items of their content
+        """
+        self.nodeItems = set()
+
         self.menu = QMenu(parent)
 
         self.menu.addAction('Alternative', self.addAlternative)
@@ -794,6 +791,32 @@ class AttackTreeScene(QGraphicsScene):
         self.menu.addAction('Sequence', self.addSequence)
         self.menu.addAction('Threshold', self.addThreshold)
 
+    def addItem(self, item):
+        """
+        Adds an item to the scene and remembers node items
+
+        :param item: Item to add
+        """
+        super().addItem(item)
+        if isinstance(item, Node):
+            self.nodeItems.add(item)
+
+    def removeItem(self, item):
+        """
+        Removes an item from the scene
+
+        :param item: Item to remove
+        """
+        self.nodeItems.discard(item)
+        super().removeItem(item)
+
+    def clear(self):
+        """
+        Removes and deletes all items of the scene
+        """
+        self.nodeItems = set()
+        super().clear()
+
     def addAlternative(self):
         """
         Adds an alternative as edge
@@ -946,16 +969,7 @@ class AttackTreeScene(QGraphicsScene):
                 item.setSelected(True)
                 menu = QMenu(self.parent())
 
-                if isinstance(item.parentItem(), Node):
-                    item = item.parentItem()
-                    menu.addAction('Edit', item.edit)
-                    menu.addAction('Delete', item.delete)
-                    menu.addAction('Select Children', item.selectChildren)
-                    menu.addAction('Copy', self.parent().copy)
-                    menu.addAction('Cut', self.parent().cut)
-                elif isinstance(item.parentItem(), QGraphicsItemGroup) and isinstance(item.parentItem().parentItem(),
-                                                                                      Node):
-                    item = item.parentItem().parentItem()
+                if isinstance(item, Node):
                     menu.addAction('Edit', item.edit)
                     menu.addAction('Delete', item.delete)
                     menu.addAction('Select Children', item.selectChildren)
@@ -984,6 +998,8 @@ class AttackTreeScene(QGraphicsScene):
         edge.start.childEdges.remove(edge)
         edge.dst.parentEdges.remove(edge)
         self.parent().tree.removeEdge(edge.start.node.id + '-' + edge.dst.node.id)
+        if isinstance(edge.start, Conjunction):
+            edge.start.redraw()
 
     def deleteSelected(self):
         """
@@ -1003,6 +1019,8 @@ class AttackTreeScene(QGraphicsScene):
                         i.start.childEdges.remove(i)
                         i.dst.parentEdges.remove(i)
                         self.parent().tree.removeEdge(i.start.node.id + '-' + i.dst.node.id)
+                        if isinstance(i.start, Conjunction):
+                            i.start.redraw()
 
     def selectNodesChildren(self):
         """
@@ -1039,41 +1057,11 @@ class AttackTreeScene(QGraphicsScene):
                 self.parent().addLastAction()
                 self.insertLine.setZValue(-1)
                 self.dstCollisions = self.itemAt(mouseEvent.scenePos(), QTransform())
-                if self.startCollisions is None or self.dstCollisions is None \
+                if not isinstance(self.startCollisions, Node) or not isinstance(self.dstCollisions, Node) \
                         or self.startCollisions == self.dstCollisions:
                     self.reset()
                     super().mouseReleaseEvent(mouseEvent)
                     return
-                if isinstance(self.startCollisions.parentItem(), Node):
-                    """
-                    Gets the start node view object
-                    """
-                    self.startCollisions = self.startCollisions.parentItem()
-                elif isinstance(self.startCollisions.parentItem(), QGraphicsItemGroup) \
-                        and isinstance(self.startCollisions.parentItem().parentItem(), Node):
-                    """
-                    Gets the start node view object if the user clicks on the text in the item
-                    """
-                    self.startCollisions = self.startCollisions.parentItem().parentItem()
-                else:
-                    self.reset()
-                    super().mouseReleaseEvent(mouseEvent)
-                    return
-                if isinstance(self.dstCollisions.parentItem(), Node):
-                    """
-                    Gets the destination node view object
-                    """
-                    self.dstCollisions = self.dstCollisions.parentItem()
-                elif isinstance(self.dstCollisions.parentItem(), QGraphicsItemGroup) \
-                        and isinstance(self.dstCollisions.parentItem().parentItem(), Node):
-                    """
-                    Gets the destination node view object if the user clicks on the text in the item
-                    """
-                    self.dstCollisions = self.dstCollisions.parentItem().parentItem()
-                else:
-                    self.reset()
-                    super().mouseReleaseEvent(mouseEvent)
-                    return
                 if self.parent().tree.addEdge(self.startCollisions.node.id, self.dstCollisions.node.id) is True:
                     self.startCollisions.addEdge(self.dstCollisions)
                     if isinstance(self.startCollisions, Conjunction):
@@ -1082,7 +1070,7 @@ class AttackTreeScene(QGraphicsScene):
                     self.reset()
                     self.parent().saved = False
                 else:
-                    MessageBox('Adding Edge is not possible', 'The Edge is not supported',
+                    MessageBox('Adding Edge is not possible', self.parent().tree.lastError,
                                icon=QMessageBox.Critical).run()
                     self.reset()
             elif self.parent().mode == 5:
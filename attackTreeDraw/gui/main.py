@@ -10,8 +10,7 @@ from PyQt5 import QtCore, QtWidgets
 
 from PyQt5.QtCore import Qt, QRectF
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
-from PyQt5.QtWidgets import QMainWindow, QAction, QToolBox, QFileDialog, QMessageBox, QDialog, QGraphicsView, \
-    QProgressDialog
+from PyQt5.QtWidgets import QMainWindow, QAction, QToolBox, QFileDialog, QMessageBox, QDialog, QGraphicsView
 from PyQt5.QtGui import QIcon, QImage, QPainter, QFontDatabase, QFont, QPageSize, QKeySequence
 
 from data.exceptions import ParserError, XMLXSDError
@@ -22,6 +21,9 @@ from .windows import MessageBox, MetaEdit, Options
 from data.handler import TreeHandler
 
 from data import types
+from layout.cache import LayoutCache
+from layout.layered import LayeredLayout
+from layout.tree import TreeLayout
 
 
 class Main(QMainWindow):
@@ -44,13 +46,18 @@ class Main(QMainWindow):
         self.modeAction = None
         self.defaultModeAction = None
         self.modeActions = {}
-        self.progress = None
-
-        self.lastAction = []
-        self.nextAction = []
 
         self.copyBuffer = []
 
+        """
+        Positions of trees which were drawn before, see printGraph
+        """
+        self.layoutCache = LayoutCache(Configuration.getLayoutCacheDirectory())
+        """
+        Checksums of the xml files saved in this session, these files are loaded without validating them again
+        """
+        self.checksums = {}
+
         """
         0: default
         1: add threat
@@ -267,239 +274,83 @@ class Main(QMainWindow):
 
         self.show()
 
-    def printGraph(self, fixedPositions=False, doReorderTree=True):
+    def printGraph(self):
         """
-        Prints the attack tree onto the graphics view
-        after the full graph was printed it will be reordered to have a nice graph
-        :param fixedPositions: prints the node at a fixed position
-        :param doReorderTree:
+        Prints the attack tree onto the graphics view.
+        The positions of the nodes are calculated by the layout (see getLayout) from the sizes of the printed nodes.
+        If the layout cache is enabled the positions are saved and trees which were drawn before are not laid out again
         """
-        for k, n in self.tree.nodeList.items():
-            n.initDFS()
-            n.view = None
-
         self.graphicsView.setScene(None)
 
-        """
-        Prints the reorder dialog
-        """
-        if doReorderTree is True:
-            self.progress = QProgressDialog("Reordering tree...", "Abort Reorder", 0, 2 ** 10, self)
-            self.progress.setWindowModality(Qt.WindowModal)
-
-        """
-        Prints all nodes connected to the root node
-        """
-        if self.tree.root is not None:
-            g = self.printGraphRecursion(self.tree.nodeList[self.tree.root], 0, 10, fixedPositions=fixedPositions)
-            if doReorderTree is True and self.progress.wasCanceled() is False:
-                i = 0
-                while fixedPositions is False and self.reorderTree(g) is not True and i < 20:
-                    i += 1
-        """
-        Prints all nodes w/o a parent node
-        """
-        for k, n in self.tree.nodeList.items():
-            if n.visited is False and len(n.parents) == 0:
-                g = self.printGraphRecursion(n, 0, self.scene.itemsBoundingRect().height() + 50,
-                                             fixedPositions=fixedPositions)
-                if doReorderTree is True and self.progress.wasCanceled() is False:
-                    i = 0
-                    while fixedPositions is False and self.reorderTree(g) is not True and i < 20:
-                        i += 1
-        """
-        Prints the rest
-        """
+        items = {}
+        sizes = {}
         for k, n in self.tree.nodeList.items():
-            if n.visited is False:
-                g = self.printGraphRecursion(n, 0, self.scene.itemsBoundingRect().height() + 50,
-                                             fixedPositions=fixedPositions)
-                if doReorderTree is True and self.progress.wasCanceled() is False:
-                    i = 0
-                    while fixedPositions is False and self.reorderTree(g) is not True and i < 20:
-                        i += 1
+            item = self.printNode(n)
+            rect = item.boundingRect()
+            items[k] = item
+            sizes[k] = (rect.width(), rect.height())
+
+        layout = self.getLayout(sizes)
+        placed = None
+        key = None
+        if Configuration.layoutCache is True:
+            key = LayoutCache.getKey(self.tree, layout, [Configuration.font.toString(), QtCore.QT_VERSION_STR])
+            placed = self.layoutCache.load(key)
+        if placed is None or placed.keys() != items.keys():
+            placed = layout.run()
+            if key is not None:
+                self.layoutCache.save(key, placed)
+
+        for k, (x, y) in placed.items():
+            rect = items[k].boundingRect()
+            items[k].setPos(x - rect.x(), y - rect.y())
 
         for k, n in self.tree.nodeList.items():
-            n.view = None
+            for c in n.children:
+                items[k].addEdge(items[c])
+        for item in items.values():
+            item.actualizeEdges()
 
-        if fixedPositions is not True:
+        if self.tree.root in items:
+            self.graphicsView.centerOn(items[self.tree.root])
+        else:
             self.graphicsView.centerOn(0, 0)
-        if doReorderTree is True:
-            self.progress.setValue(2 ** 10)
         self.graphicsView.setScene(self.scene)
         self.graphicsView.viewport().update()
 
-    def printGraphRecursion(self, node, x, y, parent=None, fixedPositions=False):
-        """
-        Prints a node recursively with its child nodes
-        returns a tuple in the style of:
-        (node, ([left_half_of_children], [right_half_of_children])
-
-        :param fixedPositions: prints the node at a fixed position
-        :param node: data node to print
-        :param x: x position of the node
-        :param y: y position of the mode
-        :param parent: parent node
-        """
-        rec = False
-
-        if node.view is None:
-            """
-            Generates a graphical object for the node
-            """
-            if fixedPositions is True and node.position is not None:
-                x = node.position[0]
-                y = node.position[1]
-            if isinstance(node, types.Threat):
-                n = Threat(node, self, x, y)
-            elif isinstance(node, types.Countermeasure):
-                n = Countermeasure(node, self, x, y)
-            else:
-                n = Conjunction(node, self, x, y)
-
-            node.view = n
-            self.scene.addItem(n)
-        else:
-            n = node.view
-            rec = True
-        startX = (n.x() + n.boundingRect().center().x()) - ((len(node.children) / 2) * 250)
-
-        if parent is not None:
-            parent.addEdge(n)
-
-        node.visited = True
-        children = []
-        it = 0
-        for c in node.children:
-            if rec is False:
-                """
-                Calls the children recursively if they are not already drawn
-                """
-                subG = self.printGraphRecursion(self.tree.nodeList[c], startX + (it * 250),
-                                                n.y() + n.boundingRect().height() + 100, n,
-                                                fixedPositions=fixedPositions)
-                children.append(subG)
-            it += 1
-
-        n.actualizeEdges()
-        left = []
-        right = []
-        sortedChildren = n.getLeftRightChildren()
-
-        for c in children:
-            if c[0] in sortedChildren[0]:
-                left.append(c)
-            else:
-                right.append(c)
-
-        return n, (left, right)
-
-    def reorderTree(self, g):
-        """
-        Reoders the tree recursively.
-        The function splits the tree into two parts when it's possible
-
-        :param g: Part of the graph
-        :return: True if no collisions where found
-        """
-        r = False
-
-        self.progress.setValue(self.progress.value() + 1)
-        if self.progress.wasCanceled():
-            return False
-
-        for subG in g[1][0]:
-            i = self.reorderTree(subG)
-            if i is True:
-                r = True
-        for subG in g[1][1]:
-            i = self.reorderTree(subG)
-            if i is True:
-                r = True
-
-        i = self.fixCollision(g[1][0], g[1][1])
-        if i is True:
-            r = True
-
-        if self.progress.wasCanceled():
-            return False
-
-        return r
-
-    def fixCollision(self, left, right):
-        """
-        Checks if there is a collision between l and r
-        If there is one both parts will be moved to the left or right side
-
-        :param left: left part of the subtree
-        :param right: right part of the subtree
-        :return: True if there was an collision
-        """
-        collisions = self.checkCollRec(left, right)
-        collision = collisions
-
-        while collisions is True:
-            if self.progress.wasCanceled():
-                return False
-            for leftItem in left:
-                self.moveRec(leftItem, -125, 0)
-            for rightItem in right:
-                self.moveRec(rightItem, 125, 0)
-            collisions = self.checkCollRec(left, right)
-            self.progress.setValue(self.progress.value() + 1)
-        return collision
-
-    def checkCollRec(self, item, toCheckList):
+    def getLayout(self, sizes):
         """
-        Checks recursively if there is a collision between an item or a list of times and a list of times
+        Returns the layout for the tree as set in the options.
+        In automatic mode extended trees (shared nodes, nodes without parent) get the layered layout
 
-        :param item: item or list to check for collisions
-        :param toCheckList: list to check the collision with item
-        :return: True if there is a collision
+        :param sizes: Dictionary with the size (width, height) of every node id
+        :return: layout.base.Layout
         """
-        if self.progress.wasCanceled():
-            return False
-        if isinstance(item, list):
-            for i in item:
-                if self.checkCollRec(i[0], toCheckList) is True:
-                    return True
-                if self.checkCollRec(i[1][0], toCheckList) is True:
-                    return True
-                if self.checkCollRec(i[1][1], toCheckList) is True:
-                    return True
-        else:
-            if len(item.collidingItems()) == 0:
-                return False
-            if isinstance(toCheckList, list):
-                for r in toCheckList:
-                    if self.checkCollRec(item, r[0]) is True:
-                        return True
-                    if self.checkCollRec(item, r[1][0]) is True:
-                        return True
-                    if self.checkCollRec(item, r[1][1]) is True:
-                        return True
-            else:
-                if toCheckList in item.collidingItems():
-                    return True
-        return False
+        if Configuration.layout == 'layered':
+            return LayeredLayout(self.tree, sizes)
+        if Configuration.layout == 'auto':
+            extended = self.tree.extended
+            layered = self.tree.checkExtended()
+            self.tree.extended = extended
+            if layered is True:
+                return LayeredLayout(self.tree, sizes)
+        return TreeLayout(self.tree, sizes)
 
-    def moveRec(self, item, x, y):
+    def printNode(self, node):
         """
-        Moves an item or a list of items by (x,y)
+        Generates a graphical object for a node and adds it to the scene
 
-        :param item: item or list of item in graphicsScene
-        :param x: x-offset to move
-        :param y: y-offset to move
+        :param node: data node to print
+        :return: graphical object of the node
         """
-        if self.progress.wasCanceled():
-            return False
-        if isinstance(item, list):
-            for i in item:
-                self.moveRec(i, x, y)
+        if isinstance(node, types.Threat):
+            n = Threat(node, self)
+        elif isinstance(node, types.Countermeasure):
+            n = Countermeasure(node, self)
         else:
-            item[0].setPos(item[0].x() + x, item[0].y() + y)
-            self.moveRec(item[1][0], x, y)
-            self.moveRec(item[1][1], x, y)
+            n = Conjunction(node, self)
+        self.scene.addItem(n)
+        return n
 
     def loadFile(self):
         """
@@ -519,13 +370,17 @@ class Main(QMainWindow):
                 return
 
         dialog = QFileDialog()
-        fileName = dialog.getOpenFileName(self, 'Open Attack Tree', '', 'attack tree file (*.xml);;All Files (*)')
+        fileName = dialog.getOpenFileName(self, 'Open Attack Tree', '',
+                                          'attack tree file (*.xml);;attack tree snapshot (*.atb);;All Files (*)')
 
         if fileName == ('', ''):
             return
         try:
             h = TreeHandler()
-            self.tree = h.buildFromXML(fileName[0])
+            if h.isBinary(fileName[0]):
+                self.tree = h.buildFromBinary(fileName[0])
+            else:
+                self.tree = h.buildFromXML(fileName[0], self.checksums.get(fileName[0]))
         except ParserError as e:
             MessageBox('Loading is not possible', 'The requested file is not compatible',
                        icon=QMessageBox.Critical).run()
@@ -541,12 +396,19 @@ class Main(QMainWindow):
             self.file = fileName
             self.scene.clear()
             self.scene.setSceneRect(self.scene.itemsBoundingRect())
-            self.printGraph(doReorderTree=False)
+            self.printGraph()
             self.scene.setSceneRect(QRectF(None))
             self.graphicsView.setScene(self.scene)
             self.graphicsView.update()
         except Exception:
             print(traceback.format_exc())
+        if len(self.tree.violations) > 0:
+            text = '\n'.join('%s -> %s: %s' % v for v in self.tree.violations[:10])
+            if len(self.tree.violations) > 10:
+                text += '\n...'
+            MessageBox('The file contains invalid edges',
+                       '%d edges violate the rules of the tree\n%s' % (len(self.tree.violations), text),
+                       icon=QMessageBox.Warning).run()
 
     def saveFile(self):
         """
@@ -580,9 +442,9 @@ class Main(QMainWindow):
         if self.tree.checkExtended():
             MessageBox('Simple Mode not available', 'There is only the extended mode available.',
                        icon=QMessageBox.Information).run()
-            fileExt = 'Extended Attack Tree File (*.xml)'
+            fileExt = 'Extended Attack Tree File (*.xml);;Attack Tree Snapshot (*.atb)'
         else:
-            fileExt = 'Simple Attack Tree File (*.xml);;Extended Attack Tree File (*.xml)'
+            fileExt = 'Simple Attack Tree File (*.xml);;Extended Attack Tree File (*.xml);;Attack Tree Snapshot (*.atb)'
 
         if self.file == ('', ''):
             dialog = QFileDialog()
@@ -595,7 +457,12 @@ class Main(QMainWindow):
         if self.file[1] == 'Extended Attack Tree File (*.xml)':
             self.tree.extended = True
 
-        save = handler.saveToXML(self.tree, self.file[0])
+        if self.file[1] == 'Attack Tree Snapshot (*.atb)' or self.file[0].endswith('.atb'):
+            save = handler.saveToBinary(self.tree, self.file[0])
+        else:
+            save = handler.saveToXML(self.tree, self.file[0])
+            if save is True:
+                self.checksums[self.file[0]] = handler.checksum(self.file[0])
         if save is not True:
             MessageBox('Error while saving file', 'There was an error saving the tree.\nError Message: %s' % save,
                        icon=QMessageBox.Information).run()
@@ -737,11 +604,118 @@ class Main(QMainWindow):
         """
         Refreshes the graph.
         """
-        for n in self.scene.items():
-            if isinstance(n, Node):
-                n.node.position = n.x(), n.y()
-        self.scene.clear()
-        self.printGraph(fixedPositions=True)
+        self.syncPositions()
+        self.updateGraph()
+
+    def updateGraph(self, nodeIds=None):
+        """
+        Updates the graph after the tree was changed, e.g. by undo, redo or paste.
+        The tree is compared with the scene and only the items of removed, added or changed nodes and edges are
+        replaced. Nodes keep their position, new nodes without a position are placed by the layout (see getLayout)
+
+        :param nodeIds: Ids of the changed nodes, e.g. from the journal. If None all nodes are compared
+        """
+        items = {}
+        removed = []
+        for i in self.scene.nodeItems:
+            if self.tree.nodeList.get(i.node.id) is i.node:
+                items[i.node.id] = i
+            else:
+                removed.append(i)
+        if nodeIds is None:
+            nodeIds = self.tree.nodeList.keys()
+        nodeIds = [k for k in nodeIds if k in self.tree.nodeList]
+
+        """
+        Finds the edges of removed nodes and the edges of the changed nodes which are not in the tree anymore
+        """
+        stale = []
+        for i in removed:
+            stale.extend(i.childEdges + i.parentEdges)
+            self.scene.removeItem(i)
+        edges = {}
+        for k in nodeIds:
+            if k not in items:
+                continue
+            for e in items[k].childEdges + items[k].parentEdges:
+                key = e.start.node.id + '-' + e.dst.node.id
+                if key in self.tree.edges and items.get(e.start.node.id) is e.start \
+                        and items.get(e.dst.node.id) is e.dst and e in e.start.childEdges \
+                        and e in e.dst.parentEdges and edges.setdefault(key, e) is e:
+                    continue
+                stale.append(e)
+
+        changed = set()
+        for e in stale:
+            if e in e.start.childEdges:
+                e.start.childEdges.remove(e)
+                if items.get(e.start.node.id) is e.start:
+                    changed.add(e.start)
+            if e in e.dst.parentEdges:
+                e.dst.parentEdges.remove(e)
+            if e.scene() is self.scene:
+                self.scene.removeItem(e)
+
+        """
+        Prints the new nodes and edges
+        """
+        unplaced = []
+        for k in nodeIds:
+            if k not in items:
+                n = self.tree.nodeList[k]
+                position = n.position
+                items[k] = self.printNode(n)
+                if position is None:
+                    unplaced.append(k)
+                else:
+                    items[k].setPos(position[0], position[1])
+                changed.add(items[k])
+        for k in nodeIds:
+            n = self.tree.nodeList[k]
+            for key, source, destination in [(k + '-' + c, k, c) for c in n.children] + \
+                                            [(p + '-' + k, p, k) for p in n.parents]:
+                if key not in edges:
+                    items[source].addEdge(items[destination])
+                    edges[key] = items[source].childEdges[-1]
+                    changed.add(items[source])
+
+        """
+        Moves the changed nodes to their position in the tree and redraws them if their content changed.
+        Conjunctions above a changed node are redrawn if the type of their children changed
+        """
+        for k in nodeIds:
+            i = items[k]
+            position = i.node.position
+            if position is not None and position != (i.x(), i.y()):
+                i.setPos(position[0], position[1])
+            if i.printedState != i.getState():
+                i.redraw()
+                changed.add(i)
+        stack = list(changed)
+        while len(stack) > 0:
+            for e in stack.pop().parentEdges:
+                if isinstance(e.start, Conjunction) and e.start.printedState != e.start.getState():
+                    e.start.redraw()
+                    changed.add(e.start)
+                    stack.append(e.start)
+        for i in changed:
+            i.actualizeEdges()
+            i.fixParentEdgeRec()
+
+        if len(unplaced) > 0:
+            sizes = {}
+            fixed = {}
+            placing = set(unplaced)
+            for k, i in items.items():
+                rect = i.boundingRect()
+                sizes[k] = (rect.width(), rect.height())
+                if k not in placing:
+                    fixed[k] = (i.x() + rect.x(), i.y() + rect.y())
+            for k, (x, y) in self.getLayout(sizes).placeNodes(unplaced, fixed).items():
+                rect = items[k].boundingRect()
+                items[k].setPos(x - rect.x(), y - rect.y())
+
+        self.graphicsView.viewport().update()
 
     def redrawItems(self):
         """
@@ -883,41 +857,45 @@ class Main(QMainWindow):
         Undos the last action
         """
         self.mouse()
-        if len(self.lastAction) > 0:
-            tree = self.lastAction.pop()
-            self.nextAction.append(copy.deepcopy(self.tree))
-            self.tree = copy.deepcopy(tree)
-
-            self.refreshGraph()
+        self.syncPositions()
+        if self.tree.journal.undo(self.tree):
+            self.fixCopyBuffer()
+            self.updateGraph(self.tree.journal.getNodeIds(self.tree.journal.redoStack[-1]))
 
     def redo(self):
         """
         Undos the last undid action
         """
         self.mouse()
-
-        if len(self.nextAction) > 0:
-            tree = self.nextAction.pop()
-            self.lastAction.append(copy.deepcopy(self.tree))
-            self.tree = copy.deepcopy(tree)
-
-            self.refreshGraph()
+        self.syncPositions()
+        if self.tree.journal.redo(self.tree):
+            self.fixCopyBuffer()
+            self.updateGraph(self.tree.journal.getNodeIds(self.tree.journal.undoStack[-1]))
 
     def addLastAction(self):
         """
-        Adds the last undo action to the undo stack
+        Starts a new action in the journal of the tree.
+        All changes until the next call are reverted together by undo
+        """
+        self.syncPositions()
+        self.tree.journal.newAction()
+
+    def syncPositions(self):
+        """
+        Saves the positions of the nodes in the scene to the tree.
+        Moves since the last action are recorded as own action in the journal
         """
-        for n in self.scene.items():
-            if isinstance(n, Node):
-                n.node.position = n.x(), n.y()
-        self.lastAction.append(copy.deepcopy(self.tree))
+        self.tree.journal.newAction()
+        for n in self.scene.nodeItems:
+            if n.node.id in self.tree.nodeList:
+                self.tree.moveNode(n.node.id, (n.x(), n.y()))
 
     def copy(self):
         """
         Saves the selected elements in the copyBuffer
         """
         self.copyBuffer = []
-        self.tree.reservedList = []
+        self.tree.releaseReservedIDs()
 
         for i in self.scene.selectedItems():
             if isinstance(i, Node):
@@ -925,15 +903,26 @@ class Main(QMainWindow):
 
         self.scene.clearSelection()
 
-        idMapper = {}
+        self.assignCopyBufferIDs()
+
+    def assignCopyBufferIDs(self):
+        """
+        Reserves new IDs for the nodes in the copy buffer
+        and changes the IDs of the nodes and their edges
+        """
+        ids = self.tree.reserveIDs(len(self.copyBuffer))
+        if ids is None:
+            self.copyBuffer = []
+            MessageBox('Copying is not possible', self.tree.lastError, icon=QMessageBox.Critical).run()
+            return
 
         """
         Generates an array to map the old IDs to new one
         """
-        for n in self.copyBuffer:
-            id = n.id
-            n.id = self.tree.getNextID(idMapper.values())
-            idMapper[id] = n.id
+        idMapper = {}
+        for n, newId in zip(self.copyBuffer, ids):
+            idMapper[n.id] = newId
+            n.id = newId
 
         """
         Changes the IDs of the nodes in the copy buffer
@@ -949,7 +938,16 @@ class Main(QMainWindow):
             for c in children:
                 if c in idMapper.keys():
                     n.children.append(idMapper[c])
-        self.tree.reservedList = copy.copy(list(idMapper.values()))
+
+    def fixCopyBuffer(self):
+        """
+        Gives the nodes in the copy buffer new IDs if an undo or redo inserted nodes with the same IDs
+        """
+        for n in self.copyBuffer:
+            if n.id in self.tree.nodeList:
+                self.tree.releaseReservedIDs()
+                self.assignCopyBufferIDs()
+                return
 
     def cut(self):
         """
@@ -957,14 +955,13 @@ class Main(QMainWindow):
         """
         self.addLastAction()
         self.saved = False
-        self.addLastAction()
         self.copyBuffer = []
-        self.tree.reservedList = []
+        self.tree.releaseReservedIDs()
 
         for i in self.scene.selectedItems():
             if isinstance(i, Node):
                 self.copyBuffer.append(copy.copy(i.node))
-                self.tree.reservedList.append(i.node.id)
+                self.tree.reserveID(i.node.id)
         self.scene.deleteSelected()
         self.scene.clearSelection()
 
@@ -1009,14 +1006,16 @@ class Main(QMainWindow):
                     xStart = i.position[0]
                     yStart = i.position[1]
                 i.position = (i.position[0] + x - xStart, i.position[1] + y - yStart)
+                self.tree.addNode(copy.copy(i))
+            for i in self.copyBuffer:
                 for e in i.children:
-                    self.tree.edgeList.append(types.Edge(i.id, e))
-                self.tree.nodeList[i.id] = copy.copy(i)
+                    self.tree.linkEdge(i.id, e)
 
+            nodeIds = [i.id for i in self.copyBuffer]
             self.copyBuffer = []
-            self.tree.reservedList = []
+            self.tree.releaseReservedIDs()
 
-            self.refreshGraph()
+            self.updateGraph(nodeIds)
 
     def zoomIn(self):
         """
@@ -1075,6 +1074,20 @@ class Main(QMainWindow):
         """
         Generates an simple tree and redraws the tree
         """
+        size = self.tree.getSimpleSize()
+        if size is None:
+            MessageBox('Generating simple tree is not possible', 'There is a cycle in the graph at node ID: %s\n'
+                                                                'Title: %s' % (self.tree.cycleNode.id,
+                                                                               self.tree.cycleNode.title),
+                       icon=QMessageBox.Critical).run()
+            return
+        if size > len(self.tree.nodeList):
+            reply = MessageBox('Generate simple tree', 'The simple tree will have %d nodes instead of %d.\n'
+                                                       'Do you want to continue?' % (size, len(self.tree.nodeList)),
+                               QMessageBox.Yes | QMessageBox.No, QMessageBox.Question, QMessageBox.Yes).run()
+            if reply != QMessageBox.Yes:
+                return
+        self.addLastAction()
         self.tree.makeSimple()
         self.redrawGraph()
 
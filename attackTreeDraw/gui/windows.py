@@ -191,9 +191,10 @@ class NodeEdit(QDialog):
 
         self.parentWidget.addLastAction()
 
-        self.nodeItem.node.attributes = newEntries.copy()
-        self.nodeItem.node.title = self.titleEdit.text().replace('\n', ' ').replace('\r', '')
-        self.nodeItem.node.description = self.descriptionEdit.toPlainText()
+        self.parentWidget.tree.editNode(self.nodeItem.node.id, {
+            'attributes': newEntries.copy(),
+            'title': self.titleEdit.text().replace('\n', ' ').replace('\r', ''),
+            'description': self.descriptionEdit.toPlainText()})
 
         self.nodeItem.redraw()
 
@@ -405,9 +406,47 @@ class Options(QWidget):
         self.generalLine.setFrameShadow(QtWidgets.QFrame.Sunken)
         self.generalTabLayout.addWidget(self.generalLine)
 
+        self.layoutLayout = QtWidgets.QHBoxLayout()
+        spacer = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Minimum)
+        self.layoutLayout.addItem(spacer)
+        self.layoutTitleLabel = QtWidgets.QLabel(self.generalTab)
+        self.layoutLayout.addWidget(self.layoutTitleLabel)
+        self.layoutBox = QtWidgets.QComboBox(self.generalTab)
+        self.layoutLayout.addWidget(self.layoutBox)
+        self.generalTabLayout.addLayout(self.layoutLayout)
+
+        self.layoutCacheLayout = QtWidgets.QHBoxLayout()
+        spacer = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Minimum)
+        self.layoutCacheLayout.addItem(spacer)
+        self.layoutCacheBox = QtWidgets.QCheckBox(self.generalTab)
+        self.layoutCacheLayout.addWidget(self.layoutCacheBox)
+        self.generalTabLayout.addLayout(self.layoutCacheLayout)
+
+        self.nodeCacheLayout = QtWidgets.QHBoxLayout()
+        spacer = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Minimum)
+        self.nodeCacheLayout.addItem(spacer)
+        self.nodeCacheTitleLabel = QtWidgets.QLabel(self.generalTab)
+        self.nodeCacheLayout.addWidget(self.nodeCacheTitleLabel)
+        self.nodeCacheBox = QtWidgets.QSpinBox(self.generalTab)
+        self.nodeCacheLayout.addWidget(self.nodeCacheBox)
+        self.generalTabLayout.addLayout(self.nodeCacheLayout)
+
         self.generalTabFreeLayout = QtWidgets.QVBoxLayout()
         self.generalTabLayout.addLayout(self.generalTabFreeLayout)
 
+        self.layoutTitleLabel.setText("Layout:")
+        self.layoutBox.addItem('Automatic', 'auto')
+        self.layoutBox.addItem('Tree', 'tree')
+        self.layoutBox.addItem('Layered', 'layered')
+        self.layoutBox.setCurrentIndex(max(0, self.layoutBox.findData(Configuration.layout)))
+        self.layoutCacheBox.setText("Save the layout of opened trees")
+        self.layoutCacheBox.setChecked(Configuration.layoutCache)
+        self.nodeCacheTitleLabel.setText("Cache for painted nodes:")
+        self.nodeCacheBox.setRange(0, 1024)
+        self.nodeCacheBox.setSuffix(" MB")
+        self.nodeCacheBox.setSpecialValueText("Off")
+        self.nodeCacheBox.setValue(Configuration.nodeCache // 1024)
+
         self.fontTitleLabel.setText("Font:")
         self.fontValueLabel.setText(Configuration.font.family() + ' ' + str(Configuration.font.pointSizeF()))
         self.fontChangeButton.setText("Change")
@@ -515,6 +554,10 @@ class Options(QWidget):
 
         After that the window will be closed
         """
+        helper.Configuration.layout = self.layoutBox.currentData()
+        helper.Configuration.layoutCache = self.layoutCacheBox.isChecked()
+        helper.Configuration.nodeCache = self.nodeCacheBox.value() * 1024
+        helper.Configuration.setNodeCacheLimit()
         helper.Configuration.saveConfig()
 
         self.parentWidget.redrawItems()
@@ -542,6 +585,7 @@ class Options(QWidget):
         dialog = QFontDialog()
         font, ok = dialog.getFont(QFont('Roboto Mono', 12), self)
         Configuration.font = font
+        Configuration.resetStyles()
 
         self.fontValueLabel.setText(font.family() + ' ' + str(font.pointSizeF()))
 
@@ -643,6 +687,7 @@ class ColorPicker(QDialog):
             self.backgroundPicker.color).name()
         helper.Configuration.colors[self.parentType][self.childType]['border'] = QColor(self.borderPicker.color).name()
         helper.Configuration.colors[self.parentType][self.childType]['font'] = QColor(self.fontPicker.color).name()
+        helper.Configuration.resetStyles()
 
         self.close()
 
@@ -740,7 +785,8 @@ class ConjunctionEdit(QDialog):
         """
         self.parentWidget.addLastAction()
 
-        self.nodeItem.node.conjunctionType = self.nodeItem.node.title = self.conjunctionChoose.currentText()
+        self.parentWidget.tree.editNode(self.nodeItem.node.id, {'conjunctionType': self.conjunctionChoose.currentText(),
+                                                                'title': self.conjunctionChoose.currentText()})
 
         self.nodeItem.redraw()
 
@@ -0,0 +1,306 @@
+import math
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from data import types
+
+
+class Layout:
+    """
+    Parent class for the layouts of a tree.
+
+    A layout calculates the positions of all nodes of a data.types.Tree without the GUI.
+    The positions are the top left corners of the boxes of the nodes.
+    The sizes of the boxes are given as input, missing sizes are estimated by estimateSize
+    """
+
+    """
+    Space between two nodes next to each other
+    """
+    horizontalSpacing = 50
+
+    """
+    Space between a node and its children
+    """
+    verticalSpacing = 100
+
+    """
+    Space between two parts of the tree which are not connected
+    """
+    componentSpacing = 50
+
+    """
+    Y position of the first part of the tree
+    """
+    top = 10
+
+    """
+    Number of nodes from which the parts of the tree are laid out in parallel processes
+    """
+    parallelNodes = 10000
+
+    """
+    Number of processes for the parallel layout, None for the number of processors
+    """
+    processes = None
+
+    def __init__(self, tree, sizes=None):
+        """
+        Constructor for Layout
+
+        :param tree: data.types.Tree to lay out
+        :param sizes: Dictionary with the size (width, height) of every node id
+        """
+        self.tree = tree
+        self.sizes = {} if sizes is None else sizes
+
+    @staticmethod
+    def estimateSize(node):
+        """
+        Estimates the size of a node like it is drawn by the GUI, e.g. for exports without a display.
+        A line of the title holds about 28 characters
+
+        :param node: data.types.Node
+        :return: Size of the node as (width, height)
+        """
+        if isinstance(node, types.Conjunction):
+            return 240, 40
+        lines = max(1, -(-len(node.title or '') // 28))
+        height = 20 + 20 * lines + 20 * len(node.attributes)
+        if isinstance(node, types.Threat):
+            height += 20
+        return 200, height
+
+    def size(self, nodeId):
+        """
+        Returns the size of a node, the size is estimated if it was not given
+
+        :param nodeId: Id of the node
+        :return: Size of the node as (width, height)
+        """
+        size = self.sizes.get(nodeId)
+        if size is None:
+            size = self.estimateSize(self.tree.nodeList[nodeId])
+            self.sizes[nodeId] = size
+        return size
+
+    def getRoots(self, nodeIds=None):
+        """
+        Returns the nodes the parts of the tree start from.
+        These are the root, all nodes without parents and the first node of every part which is only a cycle
+
+        :param nodeIds: Ids of the nodes to search in, e.g. a part of the tree. All nodes if None
+        :return: Generator of node ids
+        """
+        nodeIds = self.tree.nodeList.keys() if nodeIds is None else nodeIds
+        if self.tree.root is not None and self.tree.root in self.tree.nodeList and self.tree.root in nodeIds:
+            yield self.tree.root
+        for k in nodeIds:
+            if len(self.tree.nodeList[k].parents) == 0 and k != self.tree.root:
+                yield k
+        for k in nodeIds:
+            yield k
+
+    def splitChildren(self, node):
+        """
+        Splits the children of a node in a left and a right part, like they are drawn by the GUI.
+        Threats are on the left and countermeasures on the right side of a threat.
+        Other children are split alternating
+
+        :param node: data.types.Node
+        :return: Tuple (left, right) with the ids of the children
+        """
+        left = []
+        right = []
+        neutralLeft = False
+        for c in node.children:
+            childType = self.tree.getTypeRecursiveDown(self.tree.nodeList[c])
+            if isinstance(node, types.Threat) and childType is types.Threat:
+                left.append(c)
+            elif isinstance(node, types.Threat) and childType is types.Countermeasure:
+                right.append(c)
+            elif neutralLeft is False:
+                left.append(c)
+                neutralLeft = True
+            else:
+                right.append(c)
+                neutralLeft = False
+        return left, right
+
+    def separate(self, nodeIds, positions, fixed, right):
+        """
+        Moves placed nodes together sideways until they do not overlap the other nodes.
+        The nodes were placed by a new layout, but the other nodes may have been moved by the user
+
+        :param nodeIds: Ids of the placed nodes
+        :param positions: Dictionary with the positions of the placed nodes, the nodes are moved in it
+        :param fixed: Dictionary with the positions of all other nodes
+        :param right: True to move the nodes to the right, False to move them to the left
+        """
+        if len(nodeIds) == 0:
+            return
+        own = set(nodeIds)
+        boxes = [(positions[k][0], positions[k][1], self.size(k)[0], self.size(k)[1]) for k in nodeIds]
+        top = min(y for x, y, w, h in boxes)
+        bottom = max(y + h for x, y, w, h in boxes)
+        obstacles = []
+        for others in (fixed, positions):
+            for k, (x, y) in others.items():
+                if k not in own and y < bottom and y + self.size(k)[1] > top:
+                    obstacles.append((x, y, self.size(k)[0], self.size(k)[1]))
+
+        shift = 0
+        while True:
+            move = 0
+            for x, y, w, h in boxes:
+                x += shift
+                for ox, oy, ow, oh in obstacles:
+                    if y < oy + oh and oy < y + h and x < ox + ow + self.horizontalSpacing \
+                            and ox < x + w + self.horizontalSpacing:
+                        if right is True:
+                            move = max(move, ox + ow + self.horizontalSpacing - x)
+                        else:
+                            move = min(move, ox - self.horizontalSpacing - w - x)
+            if move == 0:
+                break
+            shift += move
+        for k in nodeIds:
+            positions[k] = (positions[k][0] + shift, positions[k][1])
+
+    def placeComponent(self, component):
+        """
+        Places a weakly connected part of the tree with its top left corner at (0, 0)
+
+        :param component: List of the node ids of the part
+        :return: Dictionary with the relative position of every node, width and height of the part
+        """
+        raise NotImplementedError
+
+    def placeComponents(self, components):
+        """
+        Places all weakly connected parts of the tree, see placeComponent.
+        Big trees with more than one part are laid out in a pool of processes. The processes only get the type,
+        id and edges of the nodes and the sizes, this is all a layout needs.
+        The processes are started by a fork server if possible, so they don't inherit the GUI
+
+        :param components: List of the parts as lists of node ids
+        :return: List with the result of placeComponent for every part
+        """
+        processes = self.processes if self.processes is not None else os.cpu_count() or 1
+        if processes < 2 or len(components) < 2 or len(self.tree.nodeList) < self.parallelNodes:
+            return [self.placeComponent(c) for c in components]
+
+        tasks = []
+        for component in components:
+            nodes = [self.tree.nodeList[k] for k in component]
+            tasks.append((type(self), self.tree.extended, [(type(n), n.id, n.children, n.parents) for n in nodes],
+                          self.tree.root if component[0] == self.tree.root else None,
+                          {k: self.size(k) for k in component}))
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+        else:
+            context = multiprocessing.get_context('spawn')
+        try:
+            with ProcessPoolExecutor(processes, mp_context=context) as pool:
+                return list(pool.map(Layout.placeComponentProcess, tasks,
+                                     chunksize=max(1, len(tasks) // (4 * processes))))
+        except (OSError, RuntimeError, pickle.PickleError):
+            return [self.placeComponent(c) for c in components]
+
+    @staticmethod
+    def placeComponentProcess(task):
+        """
+        Places a part of a tree in a process of the pool, see placeComponents
+
+        :param task: Tuple with the layout class, the extended flag, the nodes as tuples (class, id, children, parents),
+                     the root of the part and the sizes
+        :return: Result of placeComponent for the part
+        """
+        layoutClass, extended, nodes, root, sizes = task
+        tree = types.Tree(extended)
+        for nodeClass, nodeId, children, parents in nodes:
+            n = nodeClass()
+            n.id = nodeId
+            n.children = children
+            n.parents = parents
+            tree.nodeList[nodeId] = n
+        tree.root = root
+        return layoutClass(tree, sizes).placeComponent(list(tree.nodeList))
+
+    def pack(self, sizes, top):
+        """
+        Packs the parts of the tree in rows from left to right.
+        A row is about as wide as the square root of the area of all parts, but at least as wide as the widest part
+
+        :param sizes: List with the size (width, height) of every part
+        :param top: Y position of the first row
+        :return: List with the position (x, y) of the top left corner of every part
+        """
+        if len(sizes) == 0:
+            return []
+        rowWidth = max(max(w for w, h in sizes),
+                       math.sqrt(sum((w + self.componentSpacing) * (h + self.componentSpacing) for w, h in sizes)))
+        positions = []
+        x = 0
+        y = top
+        rowHeight = 0
+        for w, h in sizes:
+            if x > 0 and x + w > rowWidth:
+                x = 0
+                y += rowHeight + self.componentSpacing
+                rowHeight = 0
+            positions.append((x, y))
+            x += w + self.componentSpacing
+            rowHeight = max(rowHeight, h)
+        return positions
+
+    def run(self, fixed=None):
+        """
+        Calculates the positions of all nodes.
+        Every weakly connected part of the tree is placed on its own (see placeComponents) and the parts are packed
+        in rows (see pack). Nodes with a fixed position keep it, the other nodes of a part are moved with the first
+        fixed node of the part. Parts without a fixed node are packed below the parts with a fixed node
+
+        :param fixed: Dictionary with positions of nodes which must not be moved
+        :return: Dictionary with the position (x, y) of every node id
+        """
+        fixed = {} if fixed is None else fixed
+        components = self.tree.getComponents()
+        positions = {}
+        free = []
+        for component, (relative, width, height) in zip(components, self.placeComponents(components)):
+            for nodeId in component:
+                if nodeId in fixed:
+                    offset = (fixed[nodeId][0] - relative[nodeId][0], fixed[nodeId][1] - relative[nodeId][1])
+                    break
+            else:
+                free.append((component, relative, width, height))
+                continue
+            for nodeId in component:
+                if nodeId in fixed:
+                    positions[nodeId] = fixed[nodeId]
+                else:
+                    positions[nodeId] = (relative[nodeId][0] + offset[0], relative[nodeId][1] + offset[1])
+
+        top = self.top
+        for k, (x, y) in positions.items():
+            top = max(top, y + self.size(k)[1] + self.componentSpacing)
+        for (component, relative, width, height), (x, y) in zip(free, self.pack([f[2:] for f in free], top)):
+            for nodeId in component:
+                positions[nodeId] = (relative[nodeId][0] + x, relative[nodeId][1] + y)
+        return positions
+
+    def placeNodes(self, nodeIds, fixed):
+        """
+        Calculates the positions of some nodes while all other nodes keep their fixed position,
+        e.g. for nodes which were added to a drawn tree.
+        Layouts which can place a part of the tree on its own overwrite it, this one lays out the whole tree
+
+        :param nodeIds: Ids of the nodes to place
+        :param fixed: Dictionary with the positions of all other nodes
+        :return: Dictionary with the position (x, y) of the nodes to place
+        """
+        positions = self.run(fixed)
+        return {k: positions[k] for k in nodeIds}
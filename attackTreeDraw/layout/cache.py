@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+
+from data import types
+
+
+class LayoutCache:
+    """
+    Cache for the positions calculated by a layout, so a tree which was drawn before is not laid out again.
+
+    The positions of every tree are saved as json file in a directory.
+    The name of the file is a hash of everything the positions depend on (see getKey):
+    the structure and the texts of the tree, the layout and the settings which change the sizes of the nodes
+    """
+
+    """
+    Version of the cache files, files of another version are not found
+    """
+    version = 1
+
+    """
+    Maximum number of files in the directory, the files used least recently are deleted
+    """
+    maxFiles = 50
+
+    def __init__(self, directory):
+        """
+        Constructor for LayoutCache
+
+        :param directory: Directory for the cache files
+        """
+        self.directory = directory
+
+    @staticmethod
+    def getKey(tree, layout, settings):
+        """
+        Calculates the key of the positions of a tree.
+        The key changes with every node, text and edge of the tree, with the layout and the given settings,
+        positions of the nodes are not part of it
+
+        :param tree: data.types.Tree
+        :param layout: layout.base.Layout which calculates the positions
+        :param settings: List of strings with the settings which change the sizes of the nodes, e.g. the font
+        :return: Key as hex string
+        """
+        digest = hashlib.sha256()
+        digest.update(repr((LayoutCache.version, type(layout).__name__, layout.horizontalSpacing,
+                            layout.verticalSpacing, layout.componentSpacing, layout.top, tree.root,
+                            list(settings))).encode('utf-8'))
+        for k, n in tree.nodeList.items():
+            if isinstance(n, types.Conjunction):
+                digest.update(repr((k, 'Conjunction', n.conjunctionType, n.children)).encode('utf-8'))
+            else:
+                digest.update(repr((k, type(n).__name__, n.title, list(n.attributes.items()),
+                                    n.children)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def getFile(self, key):
+        """
+        :param key: Key of the positions
+        :return: Path of the cache file for the key
+        """
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, key):
+        """
+        Loads the positions for a key
+
+        :param key: Key of the positions, see getKey
+        :return: Dictionary with the position (x, y) of every node id or None if there are no positions for the key
+        """
+        try:
+            with open(self.getFile(key), 'r') as fp:
+                data = json.load(fp)
+            os.utime(self.getFile(key))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != self.version or data.get('key') != key:
+            return None
+        try:
+            return {k: (float(x), float(y)) for k, (x, y) in data['positions'].items()}
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, key, positions):
+        """
+        Saves the positions for a key.
+        The file is written under a temporary name and renamed, so a cache file is always complete
+
+        :param key: Key of the positions, see getKey
+        :param positions: Dictionary with the position (x, y) of every node id
+        :return: True if saving was successfully else returns exception
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = self.getFile(key) + '.tmp'
+            with open(temporary, 'w') as fp:
+                json.dump({'version': self.version, 'key': key, 'positions': positions}, fp)
+            os.replace(temporary, self.getFile(key))
+            self.prune()
+        except OSError as e:
+            return e
+        return True
+
+    def prune(self):
+        """
+        Deletes the files used least recently if there are more than maxFiles files
+        """
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.json')]
+        if len(files) <= self.maxFiles:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - self.maxFiles]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
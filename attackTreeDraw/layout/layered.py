@@ -0,0 +1,291 @@
+import bisect
+
+from .base import Layout
+
+
+class LayeredLayout(Layout):
+    """
+    Layered layout (Sugiyama) for extended trees with shared nodes and parts which are not connected.
+
+    Every weakly connected part of the tree is laid out on its own in four steps:
+        1. edges which close a cycle are reversed
+        2. every node is put in the layer below its lowest parent (longest path layering),
+           edges over more than one layer get dummy nodes in the layers between
+        3. the order of the nodes in the layers is improved with the barycenter heuristic
+           for a bounded number of sweeps, the order with the fewest crossings is kept
+        4. every node is moved to the mean position of its neighbours as close as the order allows
+
+    The parts are packed in rows, see Layout.run
+    """
+
+    """
+    Number of down and up sweeps to reduce the crossings
+    """
+    sweeps = 4
+
+    """
+    Width of a dummy node of a long edge
+    """
+    dummyWidth = 20
+
+    def placeComponent(self, component):
+        """
+        Places a weakly connected part of the tree with its top left corner at (0, 0)
+
+        :param component: List of the node ids of the part
+        :return: Dictionary with the relative position of every node, width and height of the part
+        """
+        children = {}
+        for nodeId in component:
+            left, right = self.splitChildren(self.tree.nodeList[nodeId])
+            children[nodeId] = left + right
+
+        """
+        Reverses the edges which close a cycle, found by a dfs. Edges to the node itself are skipped
+        """
+        down = {nodeId: [] for nodeId in component}
+        state = {}
+        for start in component:
+            if start in state:
+                continue
+            state[start] = False
+            stack = [(start, iter(children[start]))]
+            while len(stack) > 0:
+                nodeId, nodeChildren = stack[-1]
+                for c in nodeChildren:
+                    if c == nodeId:
+                        continue
+                    if c not in state:
+                        down[nodeId].append(c)
+                        state[c] = False
+                        stack.append((c, iter(children[c])))
+                        break
+                    if state[c] is False:
+                        down[c].append(nodeId)
+                    else:
+                        down[nodeId].append(c)
+                else:
+                    state[nodeId] = True
+                    stack.pop()
+
+        """
+        Longest path layering in topological order
+        """
+        up = {nodeId: [] for nodeId in component}
+        for nodeId in component:
+            down[nodeId] = list(dict.fromkeys(down[nodeId]))
+            for c in down[nodeId]:
+                up[c].append(nodeId)
+        missing = {nodeId: len(up[nodeId]) for nodeId in component}
+        layer = {}
+        queue = [nodeId for nodeId in component if missing[nodeId] == 0]
+        for nodeId in queue:
+            layer[nodeId] = max((layer[p] + 1 for p in up[nodeId]), default=0)
+            for c in down[nodeId]:
+                missing[c] -= 1
+                if missing[c] == 0:
+                    queue.append(c)
+
+        """
+        Dummy nodes for edges over more than one layer
+        """
+        for nodeId in component:
+            for c in down[nodeId]:
+                previous = nodeId
+                for l in range(layer[nodeId] + 1, layer[c]):
+                    dummy = ('dummy', nodeId, c, l)
+                    layer[dummy] = l
+                    down[previous] = [dummy if n == c else n for n in down[previous]]
+                    down[dummy] = [c]
+                    up[dummy] = [previous]
+                    up[c] = [dummy if n == previous else n for n in up[c]]
+                    previous = dummy
+
+        """
+        First order of the layers from a dfs, so subtrees stay together
+        """
+        layers = [[] for _ in range(max(layer.values()) + 1)]
+        seen = set()
+        for start in queue:
+            if start in seen or len(up[start]) > 0:
+                continue
+            seen.add(start)
+            stack = [start]
+            while len(stack) > 0:
+                nodeId = stack.pop()
+                layers[layer[nodeId]].append(nodeId)
+                for c in reversed(down[nodeId]):
+                    if c not in seen:
+                        seen.add(c)
+                        stack.append(c)
+
+        layers = self.reduceCrossings(layers, up, down)
+        return self.assignCoordinates(layers, up, down)
+
+    def reduceCrossings(self, layers, up, down):
+        """
+        Sorts the nodes of every layer by the mean position of their neighbours in the layer above (down sweep)
+        or below (up sweep). The order with the fewest crossings is returned
+
+        :param layers: List of the layers with the node ids in their order
+        :param up: Neighbours in the layer above for every node
+        :param down: Neighbours in the layer below for every node
+        :return: List of the layers with the new order
+        """
+        best = [list(l) for l in layers]
+        bestCrossings = self.countCrossings(layers, down)
+        for sweep in range(self.sweeps):
+            if bestCrossings == 0:
+                break
+            for neighbours, indices in ((up, range(1, len(layers))), (down, range(len(layers) - 2, -1, -1))):
+                for i in indices:
+                    other = layers[i - 1] if neighbours is up else layers[i + 1]
+                    position = {n: p for p, n in enumerate(other)}
+                    keys = {}
+                    for p, n in enumerate(layers[i]):
+                        if len(neighbours[n]) > 0:
+                            keys[n] = sum(position[m] for m in neighbours[n]) / len(neighbours[n])
+                        else:
+                            keys[n] = p * len(other) / len(layers[i])
+                    layers[i].sort(key=keys.get)
+                crossings = self.countCrossings(layers, down)
+                if crossings < bestCrossings:
+                    best = [list(l) for l in layers]
+                    bestCrossings = crossings
+        return best
+
+    @staticmethod
+    def countCrossings(layers, down):
+        """
+        Counts the crossings of the edges between all layers
+
+        :param layers: List of the layers with the node ids in their order
+        :param down: Neighbours in the layer below for every node
+        :return: Number of crossings
+        """
+        crossings = 0
+        for i in range(len(layers) - 1):
+            position = {n: p for p, n in enumerate(layers[i + 1])}
+            ends = []
+            for n in layers[i]:
+                ends.extend(sorted(position[c] for c in down[n]))
+            """
+            Counts the inversions of the lower ends
+            """
+            seen = []
+            for e in reversed(ends):
+                index = bisect.bisect_left(seen, e)
+                crossings += index
+                seen.insert(index, e)
+        return crossings
+
+    def width(self, nodeId):
+        """
+        :param nodeId: Id of a node or dummy node
+        :return: Width of the node
+        """
+        if isinstance(nodeId, tuple):
+            return self.dummyWidth
+        return self.size(nodeId)[0]
+
+    def assignCoordinates(self, layers, up, down):
+        """
+        Assigns the positions to the ordered layers.
+        Every node is moved to the mean center of its neighbours above (down sweep) or below (up sweep).
+        The order and the spacing of a layer are kept with the pool adjacent violators algorithm,
+        which finds the positions with the smallest squared distance to the wanted ones
+
+        :param layers: List of the layers with the node ids in their order
+        :param up: Neighbours in the layer above for every node
+        :param down: Neighbours in the layer below for every node
+        :return: Dictionary with the relative position of every node, width and height of the part
+        """
+        """
+        Offsets of the centers in every layer if all nodes are placed next to each other
+        """
+        offsets = []
+        center = {}
+        for l in layers:
+            layerOffsets = []
+            x = 0
+            for i, n in enumerate(l):
+                if i > 0:
+                    x += (self.width(l[i - 1]) + self.width(n)) / 2 + self.horizontalSpacing
+                layerOffsets.append(x)
+                center[n] = x
+            offsets.append(layerOffsets)
+
+        for sweep in range(self.sweeps):
+            for neighbours, indices in ((up, range(1, len(layers))), (down, range(len(layers) - 2, -1, -1))):
+                for i in indices:
+                    l = layers[i]
+                    layerOffsets = offsets[i]
+                    """
+                    Pool adjacent violators: the wanted positions minus the offsets must not decrease
+                    """
+                    blocks = []
+                    for n, offset in zip(l, layerOffsets):
+                        nodeNeighbours = neighbours[n]
+                        if len(nodeNeighbours) > 0:
+                            x = sum(center[m] for m in nodeNeighbours) / len(nodeNeighbours)
+                        else:
+                            x = center[n]
+                        blocks.append([x - offset, 1])
+                        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+                            value, count = blocks.pop()
+                            blocks[-1][0] = (blocks[-1][0] * blocks[-1][1] + value * count) / (blocks[-1][1] + count)
+                            blocks[-1][1] += count
+                    j = 0
+                    for value, count in blocks:
+                        for n in l[j:j + count]:
+                            center[n] = value + layerOffsets[j]
+                            j += 1
+
+        positions = {}
+        left = min(center[l[0]] - self.width(l[0]) / 2 for l in layers)
+        right = max(center[l[-1]] + self.width(l[-1]) / 2 for l in layers)
+        y = 0
+        for l in layers:
+            height = 0
+            for n in l:
+                if isinstance(n, tuple):
+                    continue
+                positions[n] = (center[n] - self.width(n) / 2 - left, y)
+                height = max(height, self.size(n)[1])
+            y += height + self.verticalSpacing
+        return positions, right - left, y - self.verticalSpacing
+
+    def placeNodes(self, nodeIds, fixed):
+        """
+        Calculates the positions of some nodes while all other nodes keep their fixed position.
+        Only the parts of the tree which contain the nodes are laid out, they are moved with their first fixed node.
+        Parts without a fixed node are placed right of all other nodes
+
+        :param nodeIds: Ids of the nodes to place
+        :param fixed: Dictionary with the positions of all other nodes
+        :return: Dictionary with the position (x, y) of the nodes to place
+        """
+        placing = set(nodeIds)
+        x = None
+        for k, position in fixed.items():
+            if x is None or position[0] + self.width(k) + self.componentSpacing > x:
+                x = position[0] + self.width(k) + self.componentSpacing
+        x = 0 if x is None else x
+
+        positions = {}
+        for component in self.tree.getComponents():
+            if placing.isdisjoint(component):
+                continue
+            relative, width, height = self.placeComponent(component)
+            offset = (x, self.top)
+            for nodeId in component:
+                if nodeId in fixed:
+                    offset = (fixed[nodeId][0] - relative[nodeId][0], fixed[nodeId][1] - relative[nodeId][1])
+                    break
+            else:
+                x += width + self.componentSpacing
+            subtree = [nodeId for nodeId in component if nodeId in placing]
+            for nodeId in subtree:
+                positions[nodeId] = (relative[nodeId][0] + offset[0], relative[nodeId][1] + offset[1])
+            self.separate(subtree, positions, fixed, True)
+        return positions
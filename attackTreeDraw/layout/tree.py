@@ -0,0 +1,345 @@
+from .base import Layout
+
+
+class TreeLayout(Layout):
+    """
+    Layout which draws the tree top down like the GUI.
+
+    Every node is drawn once below the first parent which reaches it from the root,
+    the other parents only get an edge to it.
+    Drawn trees in the same connected part are placed below each other.
+    The subtrees are placed as tidy tree (see placeTree) with the left children (threats) on the left
+    and the right children (countermeasures) on the right side of their parent
+    """
+
+    def __init__(self, tree, sizes=None):
+        """
+        Constructor for TreeLayout
+
+        :param tree: data.types.Tree to lay out
+        :param sizes: Dictionary with the size (width, height) of every node id
+        """
+        super().__init__(tree, sizes)
+        """
+        Roots of the drawn trees, the children and the parent of every node in the drawn trees
+        """
+        self.roots = []
+        self.treeChildren = {}
+        self.treeParent = {}
+        """
+        Values of the tidy tree algorithm for every node, see placeTree
+        """
+        self.prelim = {}
+        self.mod = {}
+        self.shift = {}
+        self.change = {}
+        self.thread = {}
+        self.ancestor = {}
+        self.number = {}
+
+    def buildForest(self, nodeIds=None):
+        """
+        Splits the graph into trees with a dfs in the order the GUI draws the nodes.
+        A node belongs to the first parent which reaches it
+
+        :param nodeIds: Ids of the nodes of a connected part of the tree to split. All nodes if None
+        """
+        self.roots = []
+        self.treeChildren = {}
+        self.treeParent = {}
+        claimed = {}
+        for root in self.getRoots(nodeIds):
+            if root in claimed:
+                continue
+            self.roots.append(root)
+            self.treeParent[root] = None
+            claimed[root] = []
+            stack = [(root, iter(self.tree.nodeList[root].children))]
+            while len(stack) > 0:
+                nodeId, children = stack[-1]
+                for c in children:
+                    if c not in claimed:
+                        claimed[nodeId].append(c)
+                        claimed[c] = []
+                        self.treeParent[c] = nodeId
+                        stack.append((c, iter(self.tree.nodeList[c].children)))
+                        break
+                else:
+                    stack.pop()
+                    own = set(claimed[nodeId])
+                    left, right = self.splitChildren(self.tree.nodeList[nodeId])
+                    self.treeChildren[nodeId] = [c for c in left if c in own] + [c for c in right if c in own]
+
+    def preOrder(self, root):
+        """
+        Returns all nodes of a drawn tree, every node before its children
+
+        :param root: Id of the root of the drawn tree
+        :return: List of node ids
+        """
+        order = []
+        stack = [root]
+        while len(stack) > 0:
+            nodeId = stack.pop()
+            order.append(nodeId)
+            stack.extend(reversed(self.treeChildren[nodeId]))
+        return order
+
+    def placeTree(self, root):
+        """
+        Places a drawn tree with its root at (0, 0).
+        The x positions are calculated with the tidy tree algorithm of Walker in the linear time version of
+        Buchheim, Juenger and Leipert: every subtree is placed once and moved next to its left siblings
+        as close as the contours of the subtrees allow.
+        All nodes with the same depth are placed in one row, so the contours can be compared row by row
+
+        :param root: Id of the root of the drawn tree
+        :return: Dictionary with the relative position of every node in the drawn tree
+        """
+        order = self.preOrder(root)
+        children = self.treeChildren
+        self.prelim = {}
+        self.mod = {}
+        self.shift = {}
+        self.change = {}
+        self.thread = {}
+        self.ancestor = {}
+        self.number = {}
+        midpoint = {}
+        for nodeId in order:
+            self.mod[nodeId] = 0
+            self.shift[nodeId] = 0
+            self.change[nodeId] = 0
+            self.thread[nodeId] = None
+            self.ancestor[nodeId] = nodeId
+            for i, c in enumerate(children[nodeId]):
+                self.number[c] = i
+        self.number[root] = 0
+
+        for nodeId in reversed(order):
+            nodeChildren = children[nodeId]
+            if len(nodeChildren) == 0:
+                midpoint[nodeId] = 0
+                continue
+            defaultAncestor = nodeChildren[0]
+            left = None
+            for c in nodeChildren:
+                if left is None:
+                    self.prelim[c] = midpoint[c]
+                else:
+                    self.prelim[c] = self.prelim[left] + self.distance(left, c)
+                    if len(children[c]) > 0:
+                        self.mod[c] = self.prelim[c] - midpoint[c]
+                    defaultAncestor = self.apportion(c, left, nodeChildren[0], defaultAncestor)
+                left = c
+            self.executeShifts(nodeId)
+            midpoint[nodeId] = (self.prelim[nodeChildren[0]] + self.prelim[nodeChildren[-1]]) / 2
+        self.prelim[root] = midpoint[root]
+
+        depths = {root: 0}
+        rowHeights = []
+        for nodeId in order:
+            depth = depths[nodeId]
+            if depth == len(rowHeights):
+                rowHeights.append(0)
+            rowHeights[depth] = max(rowHeights[depth], self.size(nodeId)[1])
+            for c in children[nodeId]:
+                depths[c] = depth + 1
+        rows = [0]
+        for height in rowHeights:
+            rows.append(rows[-1] + height + self.verticalSpacing)
+
+        positions = {}
+        offsets = {root: 0}
+        for nodeId in order:
+            x = self.prelim[nodeId] + offsets[nodeId]
+            positions[nodeId] = (x - self.size(nodeId)[0] / 2, rows[depths[nodeId]])
+            for c in children[nodeId]:
+                offsets[c] = offsets[nodeId] + self.mod[nodeId]
+
+        rootX = positions[root][0]
+        return {k: (x - rootX, y) for k, (x, y) in positions.items()}
+
+    def distance(self, left, right):
+        """
+        Returns the distance between the centers of two nodes next to each other
+
+        :param left: Id of the left node
+        :param right: Id of the right node
+        :return: Distance between the centers
+        """
+        return (self.size(left)[0] + self.size(right)[0]) / 2 + self.horizontalSpacing
+
+    def nextLeft(self, nodeId):
+        """
+        :param nodeId: Id of a node
+        :return: Next node on the left contour of the subtree
+        """
+        children = self.treeChildren[nodeId]
+        return children[0] if len(children) > 0 else self.thread[nodeId]
+
+    def nextRight(self, nodeId):
+        """
+        :param nodeId: Id of a node
+        :return: Next node on the right contour of the subtree
+        """
+        children = self.treeChildren[nodeId]
+        return children[-1] if len(children) > 0 else self.thread[nodeId]
+
+    def apportion(self, nodeId, leftSibling, leftmostSibling, defaultAncestor):
+        """
+        Moves the subtree of a node to the right until it does not overlap with the subtrees of its left siblings.
+        The contours of both sides are followed row by row, threads are added where one contour ends earlier
+
+        :param nodeId: Id of the node
+        :param leftSibling: Id of the left sibling of the node
+        :param leftmostSibling: Id of the leftmost sibling of the node
+        :param defaultAncestor: Id of the default ancestor, see Buchheim et al.
+        :return: New default ancestor
+        """
+        insideRight = outsideRight = nodeId
+        insideLeft = leftSibling
+        outsideLeft = leftmostSibling
+        sumInsideRight = self.mod[insideRight]
+        sumOutsideRight = self.mod[outsideRight]
+        sumInsideLeft = self.mod[insideLeft]
+        sumOutsideLeft = self.mod[outsideLeft]
+        while self.nextRight(insideLeft) is not None and self.nextLeft(insideRight) is not None:
+            insideLeft = self.nextRight(insideLeft)
+            insideRight = self.nextLeft(insideRight)
+            outsideLeft = self.nextLeft(outsideLeft)
+            outsideRight = self.nextRight(outsideRight)
+            self.ancestor[outsideRight] = nodeId
+            shift = self.prelim[insideLeft] + sumInsideLeft - self.prelim[insideRight] - sumInsideRight \
+                + self.distance(insideLeft, insideRight)
+            if shift > 0:
+                ancestor = self.ancestor[insideLeft]
+                if self.treeParent[ancestor] != self.treeParent[nodeId]:
+                    ancestor = defaultAncestor
+                self.moveSubtree(ancestor, nodeId, shift)
+                sumInsideRight += shift
+                sumOutsideRight += shift
+            sumInsideLeft += self.mod[insideLeft]
+            sumInsideRight += self.mod[insideRight]
+            sumOutsideLeft += self.mod[outsideLeft]
+            sumOutsideRight += self.mod[outsideRight]
+        if self.nextRight(insideLeft) is not None and self.nextRight(outsideRight) is None:
+            self.thread[outsideRight] = self.nextRight(insideLeft)
+            self.mod[outsideRight] += sumInsideLeft - sumOutsideRight
+        if self.nextLeft(insideRight) is not None and self.nextLeft(outsideLeft) is None:
+            self.thread[outsideLeft] = self.nextLeft(insideRight)
+            self.mod[outsideLeft] += sumInsideRight - sumOutsideLeft
+            defaultAncestor = nodeId
+        return defaultAncestor
+
+    def moveSubtree(self, left, right, shift):
+        """
+        Moves the subtree of right by shift.
+        The siblings between left and right are moved later by executeShifts, so they are spaced out evenly
+
+        :param left: Id of the left sibling which caused the move
+        :param right: Id of the node to move
+        :param shift: Distance to move
+        """
+        subtrees = self.number[right] - self.number[left]
+        self.change[right] -= shift / subtrees
+        self.shift[right] += shift
+        self.change[left] += shift / subtrees
+        self.prelim[right] += shift
+        self.mod[right] += shift
+
+    def executeShifts(self, nodeId):
+        """
+        Executes the moves of the children of a node which were collected by moveSubtree
+
+        :param nodeId: Id of the node
+        """
+        shift = 0
+        change = 0
+        for c in reversed(self.treeChildren[nodeId]):
+            self.prelim[c] += shift
+            self.mod[c] += shift
+            change += self.change[c]
+            shift += self.shift[c] + change
+
+    def placeComponent(self, component):
+        """
+        Places a connected part of the tree with its top left corner at (0, 0).
+        The drawn trees of the part are placed below each other
+
+        :param component: List of the node ids of the part
+        :return: Dictionary with the relative position of every node, width and height of the part
+        """
+        self.buildForest(component)
+        positions = {}
+        y = 0
+        width = 0
+        for root in self.roots:
+            relative = self.placeTree(root)
+            left = min(x for x, _ in relative.values())
+            bottom = y
+            for nodeId, (x, nodeY) in relative.items():
+                positions[nodeId] = (x - left, y + nodeY)
+                width = max(width, x - left + self.size(nodeId)[0])
+                bottom = max(bottom, y + nodeY + self.size(nodeId)[1])
+            y = bottom + self.componentSpacing
+        return positions, width, y - self.componentSpacing
+
+    def placeNodes(self, nodeIds, fixed):
+        """
+        Calculates the positions of some nodes while all other nodes keep their fixed position.
+        Only the drawn subtree of the lowest fixed ancestor of the nodes is placed again,
+        so the new nodes are moved next to the contours of their fixed siblings.
+        Nodes without a fixed ancestor are placed below all other nodes
+
+        :param nodeIds: Ids of the nodes to place
+        :param fixed: Dictionary with the positions of all other nodes
+        :return: Dictionary with the position (x, y) of the nodes to place
+        """
+        self.buildForest()
+        tops = []
+        for nodeId in nodeIds:
+            top = nodeId
+            while self.treeParent[top] is not None and self.treeParent[top] not in fixed:
+                top = self.treeParent[top]
+            tops.append(top)
+
+        bottom = None
+        for k, (x, y) in fixed.items():
+            if bottom is None or y + self.size(k)[1] > bottom:
+                bottom = y + self.size(k)[1]
+
+        positions = {}
+        placed = {}
+        for top in dict.fromkeys(tops):
+            if top in positions:
+                continue
+            subtree = []
+            anchor = self.treeParent[top]
+            if anchor is None:
+                anchor = top
+                relative = self.placeTree(top)
+                positions[top] = (0, self.top if bottom is None else bottom + self.componentSpacing)
+            else:
+                if anchor not in placed:
+                    placed[anchor] = self.placeTree(anchor)
+                relative = placed[anchor]
+                positions[top] = (fixed[anchor][0] + relative[top][0] - relative[anchor][0],
+                                  fixed[anchor][1] + relative[top][1] - relative[anchor][1])
+            for nodeId in self.preOrder(top):
+                if nodeId in fixed:
+                    continue
+                if nodeId != top:
+                    parent = self.treeParent[nodeId]
+                    parentPosition = fixed[parent] if parent in fixed else positions[parent]
+                    positions[nodeId] = (parentPosition[0] + relative[nodeId][0] - relative[parent][0],
+                                         parentPosition[1] + relative[nodeId][1] - relative[parent][1])
+                subtree.append(nodeId)
+            if anchor != top:
+                center = fixed[anchor][0] + self.size(anchor)[0] / 2
+                self.separate(subtree, positions, fixed, positions[top][0] + self.size(top)[0] / 2 >= center)
+            for nodeId in subtree:
+                nodeBottom = positions[nodeId][1] + self.size(nodeId)[1]
+                if bottom is None or nodeBottom > bottom:
+                    bottom = nodeBottom
+        return positions